@@ -1,10 +1,29 @@
+import os
+
 import flask
 from flask.json import jsonify
-import uuid
 
+import wire
 from model import Warehouse
+from feed import FeedManager
+import prefetch
+from prefetch import PrefetchManager
+from simulations import SimulationManager, SimulationNotFound
+from streaming import delta_lines
 
-robotsSimulations = {}
+# Con WAREHOUSE_SNAPSHOT_DIR las simulaciones expulsadas se guardan en disco en lugar de perderse, y con
+# WAREHOUSE_CHECKPOINT_STEPS también cada tantos pasos, para recuperarlas por id tras reiniciar el servicio.
+# WAREHOUSE_MAX_MEMORY (bytes, 256 MB por defecto) limita la memoria estimada del total de simulaciones.
+checkpoint_steps = os.environ.get("WAREHOUSE_CHECKPOINT_STEPS")
+robotsSimulations = SimulationManager(max_simulations=64, ttl=30 * 60,
+                                      max_memory=int(os.environ.get("WAREHOUSE_MAX_MEMORY", 256 * 1024 * 1024)),
+                                      snapshot_dir=os.environ.get("WAREHOUSE_SNAPSHOT_DIR"), load=Warehouse.load,
+                                      checkpoint_steps=int(checkpoint_steps) if checkpoint_steps else None)
+feeds = FeedManager(robotsSimulations)
+# Con WAREHOUSE_PREFETCH_FRAMES cada simulación consultada se sigue calculando en segundo plano (hasta un lote como el
+# último pedido y como mucho tantos pasos) y los GET con ?steps se sirven de esos pasos ya calculados
+prefetch_frames = os.environ.get("WAREHOUSE_PREFETCH_FRAMES")
+prefetchers = PrefetchManager(robotsSimulations, max_frames=int(prefetch_frames)) if prefetch_frames else None
 model = None
 
 app = flask.Flask(__name__)
@@ -12,28 +31,163 @@ app = flask.Flask(__name__)
 
 @app.route("/warehouseSimulations", methods=["POST"])
 def create():
-    global robotsSimulations
-
-    warehouse_id = str(uuid.uuid4())
-    robotsSimulations[warehouse_id] = Warehouse(box_percentage=0.37, num_robots=5)
+    # ?seed=N hace la simulación reproducible; ?route_cache=N cachea hasta N rutas (RouteCache)
+    seed = flask.request.args.get('seed', default=None, type=int)
+    route_cache = flask.request.args.get('route_cache', default=None, type=int)
+    if route_cache is not None and route_cache < 1:
+        return jsonify({"error": "route_cache must be at least 1"}), 400
+    # El servicio no lee el histórico de DataCollector, así que no se guarda (crecería una fila por paso)
+    warehouse_id = robotsSimulations.create(Warehouse(box_percentage=0.37, num_robots=5, seed=seed,
+                                                      collect_data=False, route_cache=route_cache))
 
     return {"warehouseId": warehouse_id}, 200, {'Location': f"/warehouseSimulations/{warehouse_id}"}
 
 
+# Todos los caminos que avanzan una simulación empiezan por los pasos ya calculados en segundo plano (si los hay)
+def run_steps(warehouse, steps):
+    return [state for _, state, _ in prefetch.advance(warehouse, steps, frame=False)]
+
+
+def run_states(warehouse, steps):
+    return [(step, state) for step, state, _ in prefetch.advance(warehouse, steps, frame=False)]
+
+
+def run_frames(warehouse, steps):
+    return wire.encode(frame for _, _, frame in prefetch.advance(warehouse, steps, state=False))
+
+
+def fast_forward(warehouse, steps, sample_every):
+    return prefetch.fast_forward(warehouse, steps, sample_every)
+
+
+def fast_forward_frames(warehouse, steps, sample_every):
+    return wire.encode(frame for _, frame in prefetch.fast_forward(warehouse, steps, sample_every, binary=True))
+
+
+def wants_frames():
+    # Accept: application/vnd.warehouse.frames pide el formato binario de wire.py; si no, JSON
+    return flask.request.accept_mimetypes.best_match(["application/json", wire.MIMETYPE]) == wire.MIMETYPE
+
+
 @app.route("/warehouseSimulations/<warehouse_id>", methods=["GET"])
 def query_state(warehouse_id):
     steps = flask.request.args.get('steps', default=1, type=int)
+    mode = flask.request.args.get('mode', default='full')
+    sample_every = flask.request.args.get('sample_every', default=None, type=int)
 
-    warehouse = robotsSimulations.get(warehouse_id)
-    if not warehouse:
+    if warehouse_id not in robotsSimulations:
         return jsonify({"error": "Warehouse simulation not found"}), 404
 
-    detailed_data = []
-    for _ in range(steps):
-        warehouse.step()
-        detailed_data.append(warehouse.collect_detailed_data())
+    try:
+        # Un fotograma completo y después solo los cambios de cada paso. Los pasos se calculan con el candado de
+        # la simulación y los deltas se generan y se envían ya sin él, así que un cliente lento no la bloquea
+        if mode == 'delta':
+            states = robotsSimulations.run(warehouse_id, run_states, steps)
+            return flask.Response(delta_lines(states), mimetype='application/x-ndjson')
+
+        # Pasos calculados por adelantado (en JSON o en binario); el avance rápido se calcula siempre en el momento
+        if prefetchers is not None and sample_every is None:
+            binary = wants_frames()
+            data = prefetchers.run(warehouse_id, steps, binary)
+            if binary:
+                return flask.Response(data, mimetype=wire.MIMETYPE)
+            return jsonify(data), 200
+
+        # Formato binario (el paso va en cada fotograma); con mode=delta se responde siempre en NDJSON
+        if wants_frames():
+            if sample_every is not None:
+                data = robotsSimulations.run(warehouse_id, fast_forward_frames, steps, sample_every)
+            else:
+                data = robotsSimulations.run(warehouse_id, run_frames, steps)
+            return flask.Response(data, mimetype=wire.MIMETYPE)
+
+        # Avance rápido: sin recoger datos, solo el estado cada sample_every pasos y al final (0: solo al final)
+        if sample_every is not None:
+            samples = robotsSimulations.run(warehouse_id, fast_forward, steps, sample_every)
+            return jsonify([{"step": step, **state} for step, state in samples]), 200
+
+        detailed_data = robotsSimulations.run(warehouse_id, run_steps, steps)
+    except SimulationNotFound:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
 
     return jsonify(detailed_data), 200
 
 
-app.run(port=5024)
+@app.route("/warehouseSimulations/<warehouse_id>/feed", methods=["GET"])
+def live_feed(warehouse_id):
+    # Server-Sent Events: el servidor avanza la simulación ?rate pasos por segundo y envía cada paso a todos los
+    # visores conectados (un fotograma completo y después deltas). ?buffer pasos pendientes como máximo por visor;
+    # a un visor lento se le descartan y recibe un fotograma completo. El rate es el del primer visor del feed.
+    rate = flask.request.args.get('rate', default=2.0, type=float)
+    buffer = flask.request.args.get('buffer', default=8, type=int)
+
+    if warehouse_id not in robotsSimulations:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    try:
+        feed, subscriber = feeds.subscribe(warehouse_id, rate, buffer)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    except SimulationNotFound:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    return flask.Response(feeds.events(feed, subscriber), mimetype='text/event-stream',
+                          headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def profiler_metrics(warehouse, settings):
+    # settings: {"enabled": bool, "reset": bool}, ambos opcionales
+    profiler = warehouse.profiler
+    if settings.get("reset"):
+        profiler.reset()
+    if "enabled" in settings:
+        profiler.enabled = bool(settings["enabled"])
+    summary = profiler.summary()
+    # Con WAREHOUSE_PREFETCH_FRAMES el modelo (y todo lo anterior) va prefetched_steps pasos por delante del último
+    # paso entregado
+    summary["delivered_step"] = warehouse.steps - len(warehouse.prefetched)
+    summary["prefetched_steps"] = len(warehouse.prefetched)
+    # Con caché de rutas, su tamaño y sus contadores desde el principio (los del perfil son desde el último reset)
+    if warehouse.pathfinder.cache is not None:
+        summary["route_cache"] = warehouse.pathfinder.cache.stats()
+    # Con charging="managed", reservas y cola de los cargadores (con la espera estimada en este paso)
+    if warehouse.charger_manager is not None:
+        summary["chargers"] = warehouse.charger_manager.summary()
+    return summary
+
+
+@app.route("/warehouseSimulations/<warehouse_id>/metrics", methods=["GET", "PUT"])
+def metrics(warehouse_id):
+    # GET devuelve las métricas por fase; PUT con {"enabled": true} activa la medición de los pasos siguientes
+    settings = (flask.request.get_json(silent=True) or {}) if flask.request.method == "PUT" else {}
+
+    if warehouse_id not in robotsSimulations:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    try:
+        summary = robotsSimulations.run(warehouse_id, profiler_metrics, settings)
+    except SimulationNotFound:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    return jsonify(summary), 200
+
+
+@app.route("/warehouseSimulations/<warehouse_id>/snapshot", methods=["POST"])
+def snapshot(warehouse_id):
+    # Guarda un checkpoint de la simulación en WAREHOUSE_SNAPSHOT_DIR
+    if robotsSimulations.snapshot_dir is None:
+        return jsonify({"error": "Snapshots are disabled (set WAREHOUSE_SNAPSHOT_DIR)"}), 409
+
+    if warehouse_id not in robotsSimulations:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    try:
+        path = robotsSimulations.checkpoint(warehouse_id)
+    except SimulationNotFound:
+        return jsonify({"error": "Warehouse simulation not found"}), 404
+
+    return jsonify({"warehouseId": warehouse_id, "bytes": os.path.getsize(path)}), 200
+
+
+if __name__ == "__main__":
+    app.run(port=5024, threaded=True)
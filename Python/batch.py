@@ -0,0 +1,150 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from layout import Layout
+from model import Warehouse
+
+LOW_BATTERY = 25
+
+COLUMNS = ["num_robots", "box_percentage", "seed", "steps", "boxes_stored", "boxes_per_step", "idle_fraction",
+           "low_battery_events", "starvation_events", "seconds"]
+
+
+# Layouts ya creados en este proceso: las corridas con el mismo layout comparten su parte estática
+LAYOUTS = {}
+
+
+def load_layout(layout):
+    if not layout:
+        return None
+    key = json.dumps(layout, sort_keys=True)
+    if key not in LAYOUTS:
+        LAYOUTS[key] = Layout.from_dict(layout)
+    return LAYOUTS[key]
+
+
+def run_simulation(params):
+    (num_robots, box_percentage, seed, steps, layout, planner, dispatch, charging, route_cache, zones, max_steps,
+     spill_dir) = params
+
+    start = time.perf_counter()
+    # Con max_steps o spill_dir se guarda el historial de cada paso, con spill_dir en un directorio por corrida
+    collect_data = max_steps is not None or spill_dir is not None
+    if spill_dir is not None:
+        spill_dir = os.path.join(spill_dir, f"robots{num_robots}_boxes{box_percentage}_seed{seed}")
+    model = Warehouse(num_robots, box_percentage, load_layout(layout), collect_data=collect_data, seed=seed,
+                      route_cache=route_cache, planner=planner, dispatch=dispatch, charging=charging, zones=zones,
+                      collect_max_steps=max_steps, collect_spill_dir=spill_dir)
+
+    idle = 0
+    low_battery_events = 0
+    starvation_events = 0
+    battery = {robot: robot.battery for robot in model.robots}
+
+    for _ in range(steps):
+        model.step()
+        for robot in model.robots:
+            if robot.destination is None and robot.box is None:
+                idle += 1
+            if robot.battery <= LOW_BATTERY < battery[robot]:
+                low_battery_events += 1
+            if robot.battery <= 0 < battery[robot]:
+                starvation_events += 1
+            battery[robot] = robot.battery
+    model.close()
+    model.datacollector.close()
+
+    return {
+        "num_robots": num_robots,
+        "box_percentage": box_percentage,
+        "seed": seed,
+        "steps": steps,
+        "boxes_stored": model.boxes_stored,
+        "boxes_per_step": model.boxes_stored / steps if steps else 0.0,
+        "idle_fraction": idle / (steps * num_robots) if steps and num_robots else 0.0,
+        "low_battery_events": low_battery_events,
+        "starvation_events": starvation_events,
+        "seconds": time.perf_counter() - start
+    }
+
+
+def sweep(robots, box_percentages, seeds, steps, layout=None, processes=None, planner=None, dispatch=None,
+          charging=None, route_cache=None, zones=None, max_steps=None, spill_dir=None):
+    layout = layout.to_dict() if layout is not None else None
+    params = [(num_robots, box_percentage, seed, steps, layout, planner, dispatch, charging, route_cache, zones,
+               max_steps, spill_dir)
+              for num_robots, box_percentage, seed in itertools.product(robots, box_percentages, seeds)]
+
+    if zones is not None:
+        # Con zonas cada corrida ya usa sus propios procesos (y los del pool no pueden crear más): una tras otra
+        results = [run_simulation(param) for param in params]
+    else:
+        with Pool(processes) as pool:
+            results = list(pool.imap_unordered(run_simulation, params))
+
+    results.sort(key=lambda result: (result["num_robots"], result["box_percentage"], result["seed"]))
+    return {column: np.array([result[column] for result in results]) for column in COLUMNS}
+
+
+def save(columns, path):
+    if path.endswith(".csv"):
+        with open(path, "w") as file:
+            file.write(",".join(COLUMNS) + "\n")
+            for row in zip(*(columns[column] for column in COLUMNS)):
+                file.write(",".join(str(value) for value in row) + "\n")
+    else:
+        np.savez_compressed(path, **columns)
+
+
+def summary(columns):
+    lines = [f"{'robots':>7} {'box_pct':>7} {'boxes/step':>11} {'idle':>6} {'low bat':>8} {'runs':>5}"]
+    keys = sorted(set(zip(columns["num_robots"].tolist(), columns["box_percentage"].tolist())))
+    for num_robots, box_percentage in keys:
+        mask = (columns["num_robots"] == num_robots) & (columns["box_percentage"] == box_percentage)
+        lines.append(f"{num_robots:>7} {box_percentage:>7} {columns['boxes_per_step'][mask].mean():>11.4f} "
+                     f"{columns['idle_fraction'][mask].mean():>6.3f} "
+                     f"{columns['low_battery_events'][mask].mean():>8.2f} {int(mask.sum()):>5}")
+    return "\n".join(lines)
+
+
+def parse_list(value, cast):
+    return [cast(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de parámetros del almacén sin interfaz")
+    parser.add_argument("--robots", default="5,10,20", help="Lista de num_robots, p. ej. 5,10,20")
+    parser.add_argument("--box-percentage", default="0.37", help="Lista de box_percentage, p. ej. 0.2,0.37")
+    parser.add_argument("--seeds", type=int, default=5, help="Número de semillas por combinación")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--layout", help="Fichero JSON con el layout (por defecto el almacén de 14x13)")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--planner", choices=["reservation", "flow"],
+                        help="Planificador de rutas (por defecto el A* original)")
+    parser.add_argument("--dispatch", choices=["batch"],
+                        help="Reparto de cajas (por defecto cada banda llama al robot más cercano)")
+    parser.add_argument("--charging", choices=["managed"],
+                        help="Gestión de cargadores (por defecto cada robot va al cargador más cercano)")
+    parser.add_argument("--route-cache", type=int,
+                        help="Rutas a cachear por corrida (RouteCache; por defecto sin caché, sin --zones)")
+    parser.add_argument("--zones", type=int,
+                        help="Procesos por corrida para las búsquedas A*, uno por zona del grid (sin --planner)")
+    parser.add_argument("--collect-max-steps", type=int,
+                        help="Guarda el historial de cada paso de cada corrida, solo los últimos tantos pasos")
+    parser.add_argument("--collect-spill-dir",
+                        help="Guarda el historial de cada paso volcándolo a disco, en un subdirectorio por corrida")
+    parser.add_argument("--output", default="batch_results.npz", help="Fichero .npz o .csv con una fila por corrida")
+    args = parser.parse_args()
+
+    results = sweep(parse_list(args.robots, int), parse_list(args.box_percentage, float), range(args.seeds),
+                    args.steps, Layout.load(args.layout) if args.layout else None, args.processes, args.planner,
+                    args.dispatch, args.charging, args.route_cache, args.zones,
+                    args.collect_max_steps, args.collect_spill_dir)
+    save(results, args.output)
+    print(summary(results))
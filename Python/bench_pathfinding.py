@@ -0,0 +1,136 @@
+import argparse
+import random
+import time
+from heapq import heappush, heappop
+
+from pathfinding import PathFinder
+
+
+def manhattan_distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+# Implementación anterior de Robot.shortest_path, sin el modelo de Mesa, para comparar
+def legacy_shortest_path(width, height, shelves, chargers, conveyor_belt, robots, start_pos, end_pos, carrying,
+                         ignore=None):
+    def is_obstacle_or_robot(pos):
+        for shelf_row in shelves:
+            if pos in shelf_row:
+                return True
+
+        if pos in chargers or pos in conveyor_belt:
+            return True
+
+        return any(robot_pos == pos for robot_pos in robots if robot_pos != ignore)
+
+    open_set = []
+    heappush(open_set, (0, start_pos))
+
+    came_from = {start_pos: None}
+    g_score = {start_pos: 0}
+    f_score = {start_pos: manhattan_distance(start_pos, end_pos)}
+
+    while open_set:
+        current = heappop(open_set)[1]
+
+        if any(manhattan_distance(current, shelf_pos) == 1
+               for shelf_row in shelves for shelf_pos in shelf_row) and carrying:
+            end_pos = current
+
+        if any(manhattan_distance(current, charger_pos) == 1 for charger_pos in chargers):
+            end_pos = current
+
+        if current == end_pos:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            path.reverse()
+            return path
+
+        for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+            neighbor = (current[0] + dx, current[1] + dy)
+
+            if 0 <= neighbor[0] < width and 0 <= neighbor[1] < height:
+                if is_obstacle_or_robot(neighbor):
+                    continue
+
+                tentative_g_score = g_score[current] + 1
+
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    f_score[neighbor] = tentative_g_score + manhattan_distance(neighbor, end_pos)
+                    if neighbor not in [item[1] for item in open_set]:
+                        heappush(open_set, (f_score[neighbor], neighbor))
+
+    return [-1]
+
+
+# Almacén sintético: pares de filas de estantes separados por pasillos, banda y
+# cargadores en la última columna, igual que el 14x13 original pero escalado.
+def synthetic_layout(width, height):
+    shelves = []
+    for y in range(0, height - 1, 4):
+        shelves.append([(x, y) for x in range(2, width - 7)])
+        if y + 1 < height:
+            shelves.append([(x, y + 1) for x in range(2, width - 7)])
+    conveyor_belt = [(width - 2, height // 2)] + [(width - 1, y) for y in range(height // 2, height)]
+    chargers = [(width - 1, y) for y in range(0, min(5, height // 2))]
+    return shelves, chargers, conveyor_belt
+
+
+def run(width, height, num_robots, queries, seed, legacy=True):
+    rng = random.Random(seed)
+    shelves, chargers, conveyor_belt = synthetic_layout(width, height)
+    pathfinder = PathFinder(width, height, shelves, chargers, conveyor_belt)
+
+    free = [(x, y) for x in range(width) for y in range(height) if not pathfinder.static[x, y]]
+    robots = rng.sample(free, num_robots)
+    pathfinder.update_robots(robots)
+    free = [pos for pos in free if pos not in robots]
+
+    cases = []
+    for _ in range(queries):
+        start = rng.choice(robots)
+        carrying = rng.random() < 0.5
+        end = rng.choice([pos for row in shelves for pos in row]) if carrying else rng.choice(free)
+        cases.append((start, end, carrying))
+
+    begin = time.perf_counter()
+    fast_routes = [pathfinder.shortest_path(start, end, carrying, start) for start, end, carrying in cases]
+    fast_time = time.perf_counter() - begin
+
+    result = {
+        "grid": f"{width}x{height}",
+        "robots": num_robots,
+        "queries": queries,
+        "fast_ms": 1000 * fast_time / queries,
+    }
+
+    if legacy:
+        begin = time.perf_counter()
+        legacy_routes = [legacy_shortest_path(width, height, shelves, chargers, conveyor_belt, robots, start, end,
+                                              carrying, start) for start, end, carrying in cases]
+        legacy_time = time.perf_counter() - begin
+
+        result["legacy_ms"] = 1000 * legacy_time / queries
+        result["speedup"] = legacy_time / fast_time
+        result["identical"] = sum(a == b for a, b in zip(fast_routes, legacy_routes))
+        result["same_length"] = sum(len(a) == len(b) for a, b in zip(fast_routes, legacy_routes))
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el A* precalculado con la implementación anterior")
+    parser.add_argument("--sizes", default="14x13,50x50,100x100", help="Tamaños de grid, p. ej. 14x13,100x100")
+    parser.add_argument("--robots", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-legacy", action="store_true", help="Solo mide la implementación nueva")
+    args = parser.parse_args()
+
+    for size in args.sizes.split(","):
+        width, height = (int(n) for n in size.split("x"))
+        print(run(width, height, args.robots, args.queries, args.seed, legacy=not args.no_legacy))
@@ -0,0 +1,146 @@
+import argparse
+import importlib
+import json
+import platform
+import statistics
+import time
+
+import mesa
+import numpy as np
+
+import bench_pathfinding
+from layout import Layout
+from model import Warehouse
+
+# Hasta 20 robots se usa el almacén original; para flotas mayores, almacenes
+# generados (ancho, alto, bandas, bancos de cargadores) con una densidad parecida
+LAYOUTS = {
+    100: (40, 30, 1, 1),
+    500: (90, 60, 2, 2),
+}
+
+
+def layout_for(num_robots):
+    if num_robots <= 20:
+        return None
+    width, height, belts, charger_banks = LAYOUTS.get(num_robots, (num_robots // 5, num_robots // 8, 1, 1))
+    return Layout.generate(width, height, belts=belts, charger_banks=charger_banks)
+
+
+def bench_steps(robot_counts, steps, seed):
+    results = []
+    for num_robots in robot_counts:
+        layout = layout_for(num_robots)
+        begin = time.perf_counter()
+        model = Warehouse(num_robots, 0.37, layout, collect_data=False, seed=seed)
+        build = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        for _ in range(steps):
+            model.step()
+        elapsed = time.perf_counter() - begin
+
+        results.append({
+            "robots": num_robots,
+            "grid": f"{model.layout.width}x{model.layout.height}",
+            "steps": steps,
+            "build_seconds": build,
+            "steps_per_second": steps / elapsed,
+            "boxes_stored": model.boxes_stored
+        })
+    return results
+
+
+def bench_pathfinding_latency(sizes, num_robots, queries, seed):
+    results = []
+    for width, height in sizes:
+        result = bench_pathfinding.run(width, height, num_robots, queries, seed, legacy=False)
+        results.append({"grid": result["grid"], "robots": num_robots, "queries": queries, "ms": result["fast_ms"]})
+    return results
+
+
+def bench_collector(num_robots, steps, seed):
+    # Bytes por paso de lo que guarda el colector, extrapolados a 10.000 pasos
+    model = Warehouse(num_robots, 0.37, seed=seed)
+    begin = time.perf_counter()
+    for _ in range(steps):
+        model.step()
+    elapsed = time.perf_counter() - begin
+
+    arrays = model.datacollector.arrays()
+    stored = sum(array.nbytes for array in arrays.values())
+    collector = model.datacollector
+    allocated = sum(chunk.robots.nbytes + chunk.shelves.nbytes + chunk.boxes.nbytes
+                    for chunk in collector.chunks + [collector.current])
+    return {
+        "robots": num_robots,
+        "steps": steps,
+        "bytes_per_10k_steps": stored * 10000 // steps,
+        "allocated_bytes": allocated,
+        "steps_per_second": steps / elapsed
+    }
+
+
+def bench_http(step_counts, repeats, seed):
+    # Latencia (mediana) y tamaño de respuesta de GET /warehouseSimulations/<id>?steps=N con el cliente de pruebas
+    service = importlib.import_module("Flask")
+    client = service.app.test_client()
+
+    results = []
+    for mode in ("full", "delta"):
+        for steps in step_counts:
+            latencies = []
+            size = 0
+            for _ in range(repeats):
+                warehouse_id = client.post(f"/warehouseSimulations?seed={seed}").get_json()["warehouseId"]
+                begin = time.perf_counter()
+                response = client.get(f"/warehouseSimulations/{warehouse_id}?steps={steps}&mode={mode}")
+                size = len(response.get_data())
+                latencies.append(time.perf_counter() - begin)
+                service.robotsSimulations.remove(warehouse_id)
+
+            results.append({
+                "mode": mode,
+                "steps": steps,
+                "median_ms": 1000 * statistics.median(latencies),
+                "payload_bytes": size
+            })
+    return results
+
+
+def run(seed=0, steps=200, robot_counts=(5, 20, 100, 500), quick=False):
+    if quick:
+        steps = min(steps, 50)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "mesa": mesa.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed
+        },
+        "steps": bench_steps(robot_counts, steps, seed),
+        "pathfinding": bench_pathfinding_latency([(14, 13), (100, 100)], 20, 20 if quick else 200, seed),
+        "collector": bench_collector(20, 1000 if quick else 10000, seed),
+        "http": bench_http([1, 10, 100], 1 if quick else 5, seed)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del modelo y de la API con semillas fijas (salida JSON)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=200, help="Pasos por medición de pasos por segundo")
+    parser.add_argument("--robots", default="5,20,100,500", help="Lista de tamaños de flota")
+    parser.add_argument("--quick", action="store_true", help="Menos pasos y repeticiones, para comprobaciones rápidas")
+    parser.add_argument("--output", help="Fichero JSON de resultados (por defecto se imprime)")
+    args = parser.parse_args()
+
+    results = run(args.seed, args.steps, [int(n) for n in args.robots.split(",")], args.quick)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,152 @@
+from heapq import heapify, heappop, heappush
+from math import ceil
+
+import numpy as np
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+FULL = 100
+LOW_BATTERY = 25
+# Carga por paso en el cargador y consumo por movimiento (Robot.charging y Robot.advance)
+CHARGE_RATE = 20
+MOVE_COST = 0.5
+
+
+# Gestor de cargadores (charging="managed"). Cada cargador tiene su propia celda
+# de carga (dock), una celda libre junto a él que no comparte con otro cargador,
+# y como mucho un robot reservado: el robot va justo a esa celda, carga allí
+# (el cargador queda ocupado) y al terminar lo libera para el siguiente de la
+# cola. Si no hay cargador libre, el robot espera donde está, fuera del reparto
+# de cajas, en una cola por orden de llegada; summary() calcula al pedirla la
+# espera estimada de cada uno. Al dejar cada caja el robot pide cargador si su
+# batería no llega a LOW_BATTERY tras la siguiente tarea: ir a la recogida más
+# cercana, llevar la caja al hueco libre más cercano a ella y desde allí ir al
+# cargador más cercano.
+class ChargerManager:
+    def __init__(self, model):
+        self.model = model
+        self.agents = {charger.pos: charger for charger in model.charger_agents}
+        self.docks = {}
+        taken = set(model.layout.pickup_points)
+        for charger in model.chargers:
+            for dx, dy in NEIGHBOURS:
+                cell = (charger[0] + dx, charger[1] + dy)
+                if 0 <= cell[0] < model.grid.width and 0 <= cell[1] < model.grid.height and \
+                        not model.pathfinder.static[cell] and cell not in taken:
+                    self.docks[charger] = cell
+                    taken.add(cell)
+                    break
+        # Cargadores sin celda de carga libre no se usan
+        self.usable = [charger for charger in model.chargers if charger in self.docks]
+        self.reserved = {}
+        self.queue = []
+        self.requests = 0
+        self.queued = 0
+        self.charges = 0
+
+    def travel(self, start, end):
+        # Pasos por el mapa de distancias si lo hay; si no (o si el campo no llega a la celda), en Manhattan
+        fields = self.model.fields
+        distance = fields.distance(start, end) if fields is not None else None
+        return distance if distance is not None else abs(start[0] - end[0]) + abs(start[1] - end[1])
+
+    def task_cost(self, robot):
+        # Batería que gasta la siguiente tarea de robot terminando en el cargador más cercano
+        if not self.usable:
+            return 0
+        pickup = min(sorted(self.model.layout.pickup_points), key=lambda pos: self.travel(robot.pos, pos))
+        slot = self.model.shelf_index.nearest_free(pickup) or pickup
+        dock = min((self.docks[charger] for charger in self.usable), key=lambda dock: self.travel(slot, dock))
+        return MOVE_COST * (self.travel(robot.pos, pickup) + self.travel(pickup, slot) + self.travel(slot, dock))
+
+    def needs_charge(self, robot):
+        return bool(self.usable) and robot.battery < FULL and \
+            (robot.battery <= LOW_BATTERY or robot.battery - self.task_cost(robot) < LOW_BATTERY)
+
+    def check(self, robot):
+        # Para un robot libre (sin destino ni caja): pide cargador si lo necesita
+        if not robot.needs_charge and self.needs_charge(robot):
+            self.request(robot)
+
+    def request(self, robot):
+        self.requests += 1
+        robot.needs_charge = True
+        self.model.robot_index.discard(robot)
+        free = [charger for charger in self.usable if charger not in self.reserved]
+        if free:
+            self.assign(robot, min(free, key=lambda charger: self.travel(robot.pos, self.docks[charger])))
+        else:
+            self.queued += 1
+            self.queue.append(robot)
+
+    def assign(self, robot, charger):
+        self.reserved[charger] = robot
+        robot.charger = charger
+        robot.destination = self.docks[charger]
+        # Con reservas, un robot que se está apartando acaba esa ruta (reservada) y planifica desde donde termina;
+        # cortarla aquí dejaría sus reservas y su siguiente celda fuera de la tabla
+        if self.model.reservations is None or not robot.moving_away:
+            robot.route = []
+            robot.idx_rute = 0
+        self.model.schedule.wake(robot)
+
+    def occupy(self, robot):
+        self.agents[robot.charger].is_occupied = True
+
+    def release(self, robot):
+        # El robot terminó de cargar: el cargador pasa al primero de la cola
+        charger = robot.charger
+        if charger is None:
+            return
+        self.charges += 1
+        self.agents[charger].is_occupied = False
+        del self.reserved[charger]
+        robot.charger = None
+        robot.needs_charge = False
+        if self.queue:
+            self.assign(self.queue.pop(0), charger)
+
+    def charge_steps(self, battery):
+        return ceil(max(FULL - battery, 0) / CHARGE_RATE)
+
+    def estimate_waits(self):
+        # {robot: pasos} hasta que cada robot de la cola empieza a cargar, desde ahora. Cada cargador queda libre
+        # cuando su robot llega a la celda de carga y carga hasta FULL; los de la cola se van quedando por orden
+        # el primero que quede libre y, desde donde esperan, van hasta su celda de carga
+        free_at = []
+        for charger in self.usable:
+            robot = self.reserved.get(charger)
+            if robot is None:
+                free_at.append((0, charger))
+            else:
+                travel = self.travel(robot.pos, self.docks[charger])
+                free_at.append((travel + self.charge_steps(robot.battery - MOVE_COST * travel), charger))
+        heapify(free_at)
+
+        waits = {}
+        for robot in self.queue:
+            free, charger = heappop(free_at)
+            travel = self.travel(robot.pos, self.docks[charger])
+            waits[robot] = free + travel
+            heappush(free_at, (free + travel + self.charge_steps(robot.battery - MOVE_COST * travel), charger))
+        return waits
+
+    def summary(self):
+        waits = self.estimate_waits()
+        return {
+            "reserved": {self.agents[charger].unique_id: robot.unique_id for charger, robot in self.reserved.items()},
+            "queue": [{"robot": robot.unique_id, "estimated_wait": waits[robot]} for robot in self.queue],
+            "requests": self.requests,
+            "queued": self.queued,
+            "charges": self.charges
+        }
+
+    def arrays(self):
+        return {"charge_queue": np.array([robot.unique_id for robot in self.queue], dtype=np.int32),
+                "charge_counters": np.array([self.requests, self.queued, self.charges], dtype=np.int64)}
+
+    def restore(self, robots, arrays):
+        # robots: {unique_id: Robot} con charger y needs_charge ya restaurados
+        self.reserved = {robot.charger: robot for robot in robots.values() if robot.charger is not None}
+        self.queue = [robots[unique_id] for unique_id in arrays["charge_queue"].tolist()]
+        self.requests, self.queued, self.charges = arrays["charge_counters"].tolist()
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+
+ROBOT_DTYPE = np.dtype([("unique_id", np.int32), ("x", np.int16), ("y", np.int16), ("battery", np.float32),
+                        ("has_box", np.bool_)])
+BOX_DTYPE = np.dtype([("step", np.int64), ("unique_id", np.int32), ("x", np.int16), ("y", np.int16),
+                      ("carried_by_robot", np.int32)])
+
+CHUNK_SIZE = 1024
+
+
+class Chunk:
+    def __init__(self, first_step, size, num_robots, num_shelves):
+        self.first_step = first_step
+        self.length = 0
+        self.robots = np.zeros((size, num_robots), dtype=ROBOT_DTYPE)
+        self.shelves = np.zeros((size, (num_shelves + 7) // 8), dtype=np.uint8)
+        self.boxes = np.zeros(size, dtype=BOX_DTYPE)
+        self.num_boxes = 0
+
+    def add_boxes(self, records):
+        end = self.num_boxes + len(records)
+        if end > len(self.boxes):
+            boxes = np.zeros(max(end, 2 * len(self.boxes)), dtype=BOX_DTYPE)
+            boxes[:self.num_boxes] = self.boxes[:self.num_boxes]
+            self.boxes = boxes
+        self.boxes[self.num_boxes:end] = records
+        self.num_boxes = end
+
+    def arrays(self):
+        return {
+            "steps": np.arange(self.first_step, self.first_step + self.length),
+            "robots": self.robots[:self.length],
+            "shelves": self.shelves[:self.length],
+            "boxes": self.boxes[:self.num_boxes]
+        }
+
+
+def concatenate(parts):
+    if not parts:
+        return {"steps": np.zeros(0, dtype=np.int64), "robots": np.zeros((0, 0), dtype=ROBOT_DTYPE),
+                "shelves": np.zeros((0, 0), dtype=np.uint8), "boxes": np.zeros(0, dtype=BOX_DTYPE)}
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+# Sustituto del DataCollector de Mesa: guarda el estado de cada paso en arrays
+# estructurados de numpy que crecen por bloques de chunk_size pasos. Con
+# max_steps solo se conservan los últimos bloques (buffer circular) y con
+# spill_dir cada bloque lleno se escribe a disco y se libera de memoria.
+class ArrayCollector:
+    def __init__(self, model, chunk_size=CHUNK_SIZE, max_steps=None, spill_dir=None, start_step=0):
+        self.chunk_size = chunk_size
+        self.max_steps = max_steps
+        self.spill_dir = spill_dir
+        self.num_robots = model.num_robots
+        self.num_shelves = sum(len(row) for row in model.shelves)
+        self.steps = start_step
+        self.chunks = []
+        self.spilled = 0
+        self.current = Chunk(start_step, chunk_size, self.num_robots, self.num_shelves)
+
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def collect(self, model):
+        chunk = self.current
+        row = chunk.length
+
+        # El modelo entrega columnas de robots, ocupación de estantes y cajas (unique_id, x, y, robot)
+        robots, shelves, boxes = model.collector_state()
+
+        records = chunk.robots[row]
+        for field in ROBOT_DTYPE.names:
+            records[field] = robots[field]
+
+        chunk.shelves[row] = np.packbits(shelves)
+
+        if boxes:
+            chunk.add_boxes([(self.steps,) + box for box in boxes])
+
+        chunk.length += 1
+        self.steps += 1
+        if chunk.length == self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        chunk = self.current
+        self.current = Chunk(self.steps, self.chunk_size, self.num_robots, self.num_shelves)
+
+        if self.spill_dir is not None:
+            np.savez(os.path.join(self.spill_dir, f"chunk_{self.spilled:06d}.npz"), **chunk.arrays())
+            self.spilled += 1
+        else:
+            self.chunks.append(chunk)
+            if self.max_steps is not None:
+                while self.chunks and self.retained_steps() - self.chunks[0].length >= self.max_steps:
+                    self.chunks.pop(0)
+
+    def skip(self, steps):
+        # Pasos avanzados sin recoger datos: se cierra el bloque actual para que el siguiente empiece en su paso
+        if self.current.length:
+            self._flush()
+        self.steps += steps
+        self.current.first_step = self.steps
+
+    def close(self):
+        # Escribe a disco el bloque incompleto, si se está volcando
+        if self.spill_dir is not None and self.current.length:
+            self._flush()
+
+    def retained_steps(self):
+        return sum(chunk.length for chunk in self.chunks) + self.current.length
+
+    def arrays(self):
+        # Pasos que siguen en memoria; los volcados a disco se leen con load()
+        return concatenate([chunk.arrays() for chunk in self.chunks + [self.current]])
+
+    def shelf_occupancy(self, arrays=None):
+        shelves = (arrays or self.arrays())["shelves"]
+        return np.unpackbits(shelves, axis=1, count=self.num_shelves).astype(bool)
+
+    @staticmethod
+    def load(spill_dir):
+        names = sorted(name for name in os.listdir(spill_dir) if name.startswith("chunk_"))
+        parts = []
+        for name in names:
+            with np.load(os.path.join(spill_dir, name)) as data:
+                parts.append({key: data[key] for key in data.files})
+        return concatenate(parts)
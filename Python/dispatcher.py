@@ -0,0 +1,162 @@
+INF = float('inf')
+# Coste de un destino sin ruta (grande pero finito para el método húngaro)
+UNREACHABLE = 10 ** 9
+
+
+def hungarian(cost):
+    # Asignación de coste mínimo (método húngaro, O(n^2 m)) para una matriz de n filas y m >= n columnas.
+    # Devuelve [(fila, columna)]; con más filas que columnas se resuelve la traspuesta.
+    rows, cols = len(cost), len(cost[0]) if len(cost) else 0
+    if rows == 0 or cols == 0:
+        return []
+    if rows > cols:
+        return [(row, col) for col, row in hungarian([list(column) for column in zip(*cost)])]
+
+    u = [0] * (rows + 1)
+    v = [0] * (cols + 1)
+    match = [0] * (cols + 1)
+    way = [0] * (cols + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        col0 = 0
+        minv = [INF] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = INF
+            col1 = 0
+            for col in range(1, cols + 1):
+                if not used[col]:
+                    current = cost[row0 - 1][col - 1] - u[row0] - v[col]
+                    if current < minv[col]:
+                        minv[col] = current
+                        way[col] = col0
+                    if minv[col] < delta:
+                        delta = minv[col]
+                        col1 = col
+            for col in range(cols + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    minv[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    return sorted((match[col] - 1, col - 1) for col in range(1, cols + 1) if match[col])
+
+
+# Reparto central de tareas. En cada paso, después de las bandas, junta las cajas
+# sin robot, los robots disponibles y los huecos libres de los estantes, y asigna
+# en lote: primero un hueco a cada caja (el más cercano a su celda de recogida sin
+# repetir) y después un robot a cada caja, con el método húngaro sobre la
+# distancia Manhattan o, si el modelo tiene campos de distancia, la real. El hueco
+# queda reservado para el robot hasta que deja la caja, así que dos robots nunca
+# van al mismo estante. Los huecos de cada celda de recogida están ordenados por
+# distancia desde el principio y un cursor salta los ya ocupados, así que cada
+# lista se recorre una sola vez mientras no se saque ninguna caja; si se saca
+# (ShelfIndex.retrieve) los cursores vuelven al principio. Con tables (un dict del layout) las
+# distancias y el orden de los huecos se comparten con los almacenes del mismo
+# layout, que no los modifican.
+class Dispatcher:
+    def __init__(self, model, tables=None):
+        self.model = model
+        self.shelves = model.shelf_index.at
+        self.reserved = {}
+        # Distancias (recogida, hueco) calculadas una vez y huecos de cada recogida ordenados por distancia
+        metric = "fields" if model.fields is not None else "manhattan"
+        if tables is not None and metric in tables:
+            self.distance, self.order = tables[metric]
+        else:
+            self.distance = {pickup: {pos: self.travel(pickup, pos) for pos in self.shelves}
+                             for pickup in model.layout.pickup_points}
+            self.order = {pickup: sorted(self.shelves, key=lambda pos: (distance[pos], pos))
+                          for pickup, distance in self.distance.items()}
+            if tables is not None:
+                tables[metric] = (self.distance, self.order)
+        self.start = dict.fromkeys(self.order, 0)
+        self.retrievals = model.shelf_index.retrievals
+        self.batches = 0
+        self.assigned = 0
+
+    def travel(self, start, end):
+        fields = self.model.fields
+        if fields is None:
+            return abs(start[0] - end[0]) + abs(start[1] - end[1])
+        distance = fields.distance(start, end)
+        return distance if distance is not None else UNREACHABLE
+
+    def taken(self, pos):
+        return pos in self.reserved or not self.model.shelf_index.is_free(pos)
+
+    def free_slots(self, pickup, count):
+        # Los count huecos libres más cercanos a pickup
+        if self.retrievals != self.model.shelf_index.retrievals:
+            self.retrievals = self.model.shelf_index.retrievals
+            self.reset()
+        slots = self.order[pickup]
+        start = self.start[pickup]
+        while start < len(slots) and self.taken(slots[start]):
+            start += 1
+        self.start[pickup] = start
+
+        free = []
+        for pos in slots[start:]:
+            if not self.taken(pos):
+                free.append(pos)
+                if len(free) == count:
+                    break
+        return free
+
+    def reserve(self, robot, pos):
+        self.reserved[pos] = robot
+        robot.shelf = pos
+
+    def release(self, robot):
+        if robot.shelf is not None and self.reserved.get(robot.shelf) is robot:
+            del self.reserved[robot.shelf]
+        robot.shelf = None
+
+    def restore(self, robots):
+        # Las reservas salen del hueco asignado a cada robot
+        self.reserved = {robot.shelf: robot for robot in robots if robot.shelf is not None}
+        self.reset()
+
+    def reset(self):
+        # Los cursores vuelven al principio de cada lista de huecos
+        for pickup in self.start:
+            self.start[pickup] = 0
+
+    def step(self):
+        model = self.model
+        belts = [belt for belt in model.schedule_cinta.agents if not belt.is_empty and belt.box.robot is None]
+        if not belts or not len(model.robot_index):
+            return
+
+        # Huecos: cada caja puede ir a cualquiera de los len(belts) huecos libres más cercanos a su recogida
+        candidates = sorted({pos for belt in belts for pos in self.free_slots(belt.pickup, len(belts))})
+        if not candidates:
+            return
+        cost = [[self.distance[belt.pickup][pos] for pos in candidates] for belt in belts]
+        slots = {belts[row]: candidates[col] for row, col in hungarian(cost)}
+        belts = [belt for belt in belts if belt in slots]
+
+        # Robots disponibles, en orden de unique_id para que el reparto sea reproducible
+        robots = sorted(model.robot_index.location, key=lambda robot: robot.unique_id)
+        cost = [[self.travel(robot.pos, belt.pickup) for robot in robots] for belt in belts]
+        self.batches += 1
+        for row, col in hungarian(cost):
+            belt, robot = belts[row], robots[col]
+            robot.destination = model.pickup_cells[belt.pickup]
+            model.robot_index.discard(robot)
+            model.schedule.wake(robot)
+            self.reserve(robot, slots[belt])
+            belt.box.robot = robot
+            model.events.assignment(model.steps, belt.box.unique_id, robot.unique_id)
+            self.assigned += 1
@@ -0,0 +1,145 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+# Campos de distancia (BFS sobre el mapa estático del PathFinder, sin robots).
+# El campo de un destino guarda para cada celda cuántos pasos hay hasta él: hasta
+# la propia celda si está libre o hasta una vecina suya si es un estante o un
+# cargador, igual que las rutas con reservas. Los de las celdas de recogida y los
+# cargadores (pinned) se calculan al crear el almacén y no se descartan; los
+# demás (huecos de estante) se calculan al pedirlos y se guardan en una caché LRU
+# de max_fields campos. Con ellos la distancia real entre dos puntos es una
+# consulta y una ruta se obtiene bajando por el campo, sin A*. El mapa estático
+# no cambia en toda la corrida, así que un campo calculado vale siempre. Con
+# shared (un dict del layout) los campos fijos se toman de ahí o se guardan ahí
+# para los demás almacenes del mismo layout.
+class DistanceFields:
+    def __init__(self, pathfinder, pinned=(), max_fields=1024, shared=None):
+        self.pathfinder = pathfinder
+        self.width = pathfinder.width
+        self.height = pathfinder.height
+        self.dtype = np.uint16 if self.width * self.height < np.iinfo(np.uint16).max else np.uint32
+        self.unreachable = int(np.iinfo(self.dtype).max)
+        self.max_fields = max_fields
+        self.pinned_targets = list(pinned)
+        self.pinned = {}
+        self.fields = OrderedDict()
+        self.shared = shared
+        self.computed = 0
+        for target in self.pinned_targets:
+            if shared is not None and target in shared:
+                self.pinned[target] = shared[target]
+            else:
+                self.field(target)
+
+    def __len__(self):
+        return len(self.pinned) + len(self.fields)
+
+    def nbytes(self):
+        return sum(field.nbytes for field in list(self.pinned.values()) + list(self.fields.values()))
+
+    def free(self, pos):
+        return not self.pathfinder._blocked[pos[0] * self.height + pos[1]]
+
+    def access(self, target):
+        # Celdas en las que termina una ruta hacia target
+        if self.free(target):
+            return [target]
+        return [(target[0] + dx, target[1] + dy) for dx, dy in NEIGHBOURS
+                if 0 <= target[0] + dx < self.width and 0 <= target[1] + dy < self.height and
+                self.free((target[0] + dx, target[1] + dy))]
+
+    def bfs(self, target):
+        width, height = self.width, self.height
+        blocked = self.pathfinder._blocked
+        distance = [self.unreachable] * (width * height)
+        frontier = deque()
+        for x, y in self.access(target):
+            distance[x * height + y] = 0
+            frontier.append((x, y))
+
+        while frontier:
+            x, y = frontier.popleft()
+            following = distance[x * height + y] + 1
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    idx = nx * height + ny
+                    if not blocked[idx] and distance[idx] == self.unreachable:
+                        distance[idx] = following
+                        frontier.append((nx, ny))
+
+        self.computed += 1
+        return np.array(distance, dtype=self.dtype)
+
+    def cached(self, target):
+        return self.pinned.get(target, self.fields.get(target))
+
+    def field(self, target):
+        field = self.cached(target)
+        if field is not None:
+            if target in self.fields:
+                self.fields.move_to_end(target)
+            return field
+
+        field = self.bfs(target)
+        if target in self.pinned_targets:
+            self.pinned[target] = field
+            if self.shared is not None:
+                field.flags.writeable = False
+                self.shared[target] = field
+        else:
+            self.fields[target] = field
+            if len(self.fields) > self.max_fields:
+                self.fields.popitem(last=False)
+        return field
+
+    def distance(self, start, end):
+        # Pasos de la ruta de start a end (o a una vecina de end si es un obstáculo), o None si no hay ruta.
+        # Se usa el campo de end o, si no está calculado y el de start sí, el de start (la distancia es simétrica).
+        if not self.free(start):
+            return None
+        source = self.cached(start) if self.cached(end) is None else None
+        if source is not None:
+            value = min((int(source.item(x * self.height + y)) for x, y in self.access(end)),
+                        default=self.unreachable)
+        else:
+            value = int(self.field(end).item(start[0] * self.height + start[1]))
+        return None if value == self.unreachable else value
+
+    def descend(self, field, start):
+        # Ruta desde start bajando por el campo hasta una celda con distancia 0
+        height = self.height
+        value = int(field.item(start[0] * height + start[1]))
+        if value == self.unreachable:
+            return [-1]
+        path = [start]
+        x, y = start
+        while value:
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < height and int(field.item(nx * height + ny)) == value - 1:
+                    x, y, value = nx, ny, value - 1
+                    break
+            path.append((x, y))
+        return path
+
+    def route(self, start, end):
+        # Camino más corto en el mapa estático. Si el campo de end no está calculado pero el de start sí (por
+        # ejemplo, de la celda de recogida a un hueco de estante) se baja desde end hacia start y se invierte.
+        if not self.free(start):
+            return [-1]
+        source = self.cached(start) if self.cached(end) is None else None
+        if source is not None:
+            cells = [cell for cell in self.access(end)
+                     if int(source.item(cell[0] * self.height + cell[1])) != self.unreachable]
+            if not cells:
+                return [-1]
+            cell = min(cells, key=lambda cell: int(source.item(cell[0] * self.height + cell[1])))
+            path = self.descend(source, cell)
+            path.reverse()
+            return path
+        return self.descend(self.field(end), start)
@@ -0,0 +1,75 @@
+import json
+from collections import deque
+
+import numpy as np
+
+ARRIVAL_DTYPE = np.dtype([("step", np.int64), ("belt", np.int16), ("box", np.int32), ("weight", np.int8)])
+ASSIGNMENT_DTYPE = np.dtype([("step", np.int64), ("box", np.int32), ("robot", np.int32)])
+
+
+# Registro compacto de una corrida: parámetros, llegadas de cajas a cada banda
+# (con su peso) y asignaciones de caja a robot. Con la semilla basta para repetir
+# la corrida exacta; al reproducirla con replay las llegadas salen del registro y
+# no del generador, así que la carga de trabajo es la misma aunque cambie la
+# lógica de los robots.
+class EventLog:
+    def __init__(self, seed, num_robots, box_percentage):
+        self.seed = seed
+        self.num_robots = num_robots
+        self.box_percentage = box_percentage
+        self.arrivals = []
+        self.assignments = []
+
+    def __eq__(self, other):
+        return isinstance(other, EventLog) and self.params() == other.params() and \
+            self.arrivals == other.arrivals and self.assignments == other.assignments
+
+    def params(self):
+        return {"seed": self.seed, "num_robots": self.num_robots, "box_percentage": self.box_percentage}
+
+    def arrival(self, step, belt, box, weight):
+        self.arrivals.append((step, belt, box, weight))
+
+    def assignment(self, step, box, robot):
+        self.assignments.append((step, box, robot))
+
+    def arrays(self):
+        return {"arrivals": np.array(self.arrivals, dtype=ARRIVAL_DTYPE),
+                "assignments": np.array(self.assignments, dtype=ASSIGNMENT_DTYPE)}
+
+    @classmethod
+    def from_arrays(cls, params, arrivals, assignments):
+        log = cls(**params)
+        log.arrivals = [tuple(arrival) for arrival in arrivals.tolist()]
+        log.assignments = [tuple(assignment) for assignment in assignments.tolist()]
+        return log
+
+    def save(self, path):
+        # Los parámetros van como JSON para conservar el tipo de la semilla (int o float)
+        np.savez_compressed(path, params=np.array(json.dumps(self.params())), **self.arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_arrays(json.loads(str(data["params"])), data["arrivals"], data["assignments"])
+
+
+# Cursor de reproducción de un EventLog; cada modelo tiene el suyo, así que un
+# mismo registro puede reproducirse varias veces
+class Replay:
+    def __init__(self, log):
+        self.log = log
+        self.pending = {}
+        for arrival in log.arrivals:
+            self.pending.setdefault(arrival[1], deque()).append(arrival)
+
+    def remaining(self):
+        # Llegadas que todavía no se han reproducido, en orden
+        return sorted(arrival for pending in self.pending.values() for arrival in pending)
+
+    def next_arrival(self, step, belt):
+        # Peso de la siguiente caja registrada para la banda si ya le toca llegar, o None
+        pending = self.pending.get(belt)
+        if pending and pending[0][0] <= step:
+            return pending.popleft()[3]
+        return None
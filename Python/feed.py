@@ -0,0 +1,235 @@
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from collections import deque
+
+from prefetch import advance
+from simulations import SimulationNotFound
+from streaming import apply_delta, delta
+
+
+# Un paso calculado por el feed. El estado se recoge una sola vez y el texto de
+# cada evento (fotograma completo o delta respecto al paso anterior publicado) se
+# codifica la primera vez que lo pide un suscriptor y se comparte con el resto.
+class Frame:
+    def __init__(self, step, state, previous):
+        self.step = step
+        self.state = state
+        self.previous = previous
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def event(self, keyframe, dropped=0):
+        kind = "keyframe" if keyframe or self.previous is None else "delta"
+        if dropped:
+            return self._encode(kind, dropped)
+        with self.lock:
+            if kind not in self.events:
+                self.events[kind] = self._encode(kind)
+            return self.events[kind]
+
+    def _encode(self, kind, dropped=0):
+        if kind == "keyframe":
+            data = {"step": self.step, "keyframe": True, **self.state}
+        else:
+            data = {"step": self.step, **delta(self.previous, self.state)}
+        if dropped:
+            data["dropped"] = dropped
+        return f"id: {self.step}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# Cola de un cliente. Si se llena porque el cliente lee más despacio de lo que
+# avanza la simulación, se descartan los pasos pendientes y el siguiente se envía
+# como fotograma completo (con cuántos se perdieron), así que los deltas siempre
+# se aplican sobre el paso anterior que recibió el cliente.
+class Subscriber:
+    def __init__(self, buffer=8):
+        self.frames = deque()
+        self.buffer = buffer
+        self.keyframe = True
+        self.dropped = 0
+        self.total_dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def push(self, frame):
+        with self.condition:
+            if len(self.frames) >= self.buffer:
+                self.dropped += len(self.frames)
+                self.total_dropped += len(self.frames)
+                self.frames.clear()
+                self.keyframe = True
+            self.frames.append(frame)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def next(self, timeout=None):
+        # Texto del siguiente evento; "" si pasa timeout sin pasos nuevos y None si el feed terminó
+        with self.condition:
+            if not self.frames and not self.closed:
+                self.condition.wait(timeout)
+            if not self.frames:
+                return None if self.closed else ""
+            frame = self.frames.popleft()
+            keyframe, dropped = self.keyframe, self.dropped
+            self.keyframe, self.dropped = False, 0
+        return frame.event(keyframe, dropped)
+
+
+# Un hilo por simulación que avanza el modelo rate pasos por segundo mientras
+# tiene suscriptores y reparte cada paso a todos ellos: varios visores de la
+# misma simulación comparten el mismo paso calculado. Si la simulación
+# desaparece, el feed termina y cierra a sus suscriptores. Un feed parado ya no
+# admite suscriptores (subscribe() devuelve None) y FeedManager arranca otro.
+class Feed:
+    def __init__(self, manager, simulation_id, rate, on_stop=None):
+        self.manager = manager
+        self.simulation_id = simulation_id
+        self.interval = 1 / rate
+        self.on_stop = on_stop
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.previous = None
+        self.steps = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+
+    def subscribe(self, buffer=8):
+        subscriber = Subscriber(buffer)
+        with self.lock:
+            if self.stopped:
+                return None
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def step(self):
+        # El delta de cada paso es respecto al paso anterior que publicó este feed. Si hay pasos ya calculados en
+        # segundo plano (prefetch.py), se publican antes de avanzar el modelo
+        with self.manager.locked(self.simulation_id) as model:
+            step, state, _ = next(advance(model, 1, frame=False))
+            frame = Frame(step, state, self.previous)
+        self.previous = frame.state
+        self.steps += 1
+        return frame
+
+    def loop(self):
+        try:
+            while True:
+                begin = time.monotonic()
+                with self.lock:
+                    if not self.subscribers:
+                        self.stopped = True
+                        break
+                frame = self.step()
+                with self.lock:
+                    subscribers = list(self.subscribers)
+                for subscriber in subscribers:
+                    subscriber.push(frame)
+                time.sleep(max(0.0, self.interval - (time.monotonic() - begin)))
+        except SimulationNotFound:
+            pass
+        finally:
+            with self.lock:
+                self.stopped = True
+                subscribers, self.subscribers = list(self.subscribers), set()
+            if self.on_stop is not None:
+                self.on_stop(self)
+            for subscriber in subscribers:
+                subscriber.close()
+
+
+# Feeds activos por simulación. subscribe() arranca el feed si no existe o ya se
+# paró (con el rate pedido) o se une al que está en marcha.
+class FeedManager:
+    def __init__(self, manager, max_rate=50):
+        self.manager = manager
+        self.max_rate = max_rate
+        self.feeds = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.feeds)
+
+    def subscribe(self, simulation_id, rate=2.0, buffer=8):
+        if not 0 < rate <= self.max_rate:
+            raise ValueError(f"rate must be between 0 and {self.max_rate} steps per second")
+        if buffer < 1:
+            raise ValueError("buffer must be at least 1")
+
+        self.manager.get(simulation_id)
+        with self.lock:
+            feed = self.feeds.get(simulation_id)
+            subscriber = feed.subscribe(buffer) if feed is not None else None
+            if subscriber is None:
+                feed = Feed(self.manager, simulation_id, rate, on_stop=self._stopped)
+                self.feeds[simulation_id] = feed
+                subscriber = feed.subscribe(buffer)
+                feed.thread.start()
+        return feed, subscriber
+
+    def _stopped(self, feed):
+        with self.lock:
+            if self.feeds.get(feed.simulation_id) is feed:
+                del self.feeds[feed.simulation_id]
+
+    def events(self, feed, subscriber, keepalive=15):
+        # Texto del stream text/event-stream; al cerrarse (el cliente se desconecta) se da de baja
+        try:
+            while True:
+                event = subscriber.next(keepalive)
+                if event is None:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+                yield event or ": keep-alive\n\n"
+        finally:
+            feed.unsubscribe(subscriber)
+
+
+def parse_events(lines):
+    # Eventos (tipo, datos) de un stream text/event-stream línea a línea
+    kind, data = "message", []
+    for line in lines:
+        line = line.decode() if isinstance(line, bytes) else line
+        line = line.rstrip("\r\n")
+        if not line:
+            if data:
+                yield kind, json.loads("\n".join(data))
+            kind, data = "message", []
+        elif line.startswith("event:"):
+            kind = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+if __name__ == "__main__":
+    # Cliente local: se suscribe al feed de una simulación y reconstruye el estado con los deltas
+    parser = argparse.ArgumentParser(description="Cliente del feed en vivo de una simulación")
+    parser.add_argument("warehouse_id")
+    parser.add_argument("--url", default="http://127.0.0.1:5024")
+    parser.add_argument("--rate", type=float, default=2.0)
+    parser.add_argument("--steps", type=int, default=20, help="Pasos a recibir antes de desconectarse")
+    args = parser.parse_args()
+
+    url = f"{args.url}/warehouseSimulations/{args.warehouse_id}/feed?rate={args.rate}"
+    state = None
+    received = 0
+    with urllib.request.urlopen(url) as response:
+        for kind, data in parse_events(response):
+            if kind == "end":
+                break
+            state = data if kind == "keyframe" else apply_delta(state, data)
+            robots = sum(robot["has_box"] for robot in state["Robots"])
+            print(f"step {data['step']} {kind} robots with box: {robots} dropped: {data.get('dropped', 0)}")
+            received += 1
+            if received == args.steps:
+                break
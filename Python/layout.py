@@ -0,0 +1,192 @@
+import argparse
+import json
+
+from pathfinding import PathFinder
+
+
+def _pos(value):
+    return int(value[0]), int(value[1])
+
+
+# Una banda transportadora: path va de la celda donde aparece la caja hasta la
+# cabeza de la banda, y pickup es la celda donde el robot espera para recogerla.
+class BeltLayout:
+    def __init__(self, path, pickup):
+        self.path = [_pos(pos) for pos in path]
+        self.pickup = _pos(pickup)
+
+    @property
+    def head(self):
+        return self.path[-1]
+
+    @property
+    def cells(self):
+        # La cabeza primero y después el resto de la banda desde la cabeza hacia atrás
+        return [self.head] + self.path[-2::-1]
+
+    def to_dict(self):
+        return {"path": [list(pos) for pos in self.path], "pickup": list(self.pickup)}
+
+
+# Lo que se calcula una sola vez por layout y comparten todos los almacenes que lo
+# usan: las celdas libres en el orden del grid y el mapa estático del PathFinder
+# (cada almacén recibe una copia). Los campos de distancia fijos (fields) y las
+# tablas del despachador (dispatch) los rellena el primer almacén que los calcula.
+class StaticLayout:
+    def __init__(self, layout):
+        obstacles = set(layout.obstacles)
+        self.free_cells = [(x, y) for x in range(layout.width) for y in range(layout.height)
+                           if (x, y) not in obstacles]
+        self.pathfinder = PathFinder(layout.width, layout.height, layout.shelves, layout.chargers,
+                                     layout.conveyor_belt)
+        self.fields = {}
+        self.dispatch = {}
+
+
+class Layout:
+    _default = None
+
+    def __init__(self, width, height, shelves, chargers, belts):
+        self.width = width
+        self.height = height
+        self.shelves = [[_pos(pos) for pos in row] for row in shelves if row]
+        self.chargers = [_pos(pos) for pos in chargers]
+        self.belts = [belt if isinstance(belt, BeltLayout) else BeltLayout(**belt) for belt in belts]
+
+        self.conveyor_belt = [pos for belt in self.belts for pos in belt.cells]
+        self.pickup_points = {belt.pickup for belt in self.belts}
+
+        # Filas en las que un robot que cede el paso se mueve hacia arriba: las que
+        # tienen justo debajo una fila de estantes
+        shelf_rows = {y for row in self.shelves for _, y in row}
+        self.nudge_up_rows = {y + 1 for y in shelf_rows if y + 1 < height and y + 1 not in shelf_rows}
+
+        self.validate()
+        self._static = None
+
+    def static(self):
+        # Se calcula con el primer almacén que usa el layout (el layout no cambia después de crearse)
+        if self._static is None:
+            self._static = StaticLayout(self)
+        return self._static
+
+    def validate(self):
+        if not self.belts:
+            raise ValueError("Layout needs at least one conveyor belt")
+
+        occupied = set()
+        for pos in [pos for row in self.shelves for pos in row] + self.chargers + self.conveyor_belt:
+            if not (0 <= pos[0] < self.width and 0 <= pos[1] < self.height):
+                raise ValueError(f"Position {pos} is outside the {self.width}x{self.height} grid")
+            if pos in occupied:
+                raise ValueError(f"Position {pos} is used more than once")
+            occupied.add(pos)
+
+        for pickup in self.pickup_points:
+            if pickup in occupied or not (0 <= pickup[0] < self.width and 0 <= pickup[1] < self.height):
+                raise ValueError(f"Pickup cell {pickup} must be a free cell inside the grid")
+
+    @property
+    def obstacles(self):
+        return [pos for row in self.shelves for pos in row] + self.chargers + self.conveyor_belt
+
+    @classmethod
+    def default(cls):
+        # El almacén original de 14x13. Es siempre el mismo objeto, así que su parte estática se calcula una vez
+        if cls._default is not None:
+            return cls._default
+        shelves = [[(i, 0) for i in range(2, 7)], [(i, 3) for i in range(2, 7)], [(i, 4) for i in range(2, 7)],
+                   [(i, 8) for i in range(2, 7)], [(i, 9) for i in range(2, 7)], [(i, 12) for i in range(2, 7)]]
+        belt = BeltLayout([(13, i) for i in range(12, 5, -1)] + [(12, 6)], (11, 6))
+        chargers = [(13, i) for i in range(0, 5)]
+        cls._default = cls(14, 13, shelves, chargers, [belt])
+        return cls._default
+
+    @classmethod
+    def generate(cls, width, height, belts=1, charger_banks=1, charger_bank_size=5, belt_length=7,
+                 block_length=10):
+        if width < 10:
+            raise ValueError("Generated layouts need a width of at least 10")
+
+        # Estantes: una fila en y = 0 y después pares de filas separados por dos
+        # pasillos, cortados en bloques con un pasillo transversal entre ellos
+        shelf_ys = [y for y in range(height) if y % 4 in (0, 3)]
+        shelf_ys = [y for y in shelf_ys if (y - 1 >= 0 and y - 1 not in shelf_ys) or
+                    (y + 1 < height and y + 1 not in shelf_ys)]
+
+        blocks = []
+        block = []
+        for x in range(2, width - 6):
+            if (x - 2) % (block_length + 1) == block_length:
+                blocks.append(block)
+                block = []
+            else:
+                block.append(x)
+        blocks.append(block)
+
+        shelves = [[(x, y) for x in block] for y in shelf_ys for block in blocks if block]
+
+        # Pared derecha: bancos de cargadores y bandas alternados, con una celda libre entre ellos
+        segments = []
+        for i in range(max(belts, charger_banks)):
+            if i < charger_banks:
+                segments.append(("chargers", charger_bank_size))
+            if i < belts:
+                segments.append(("belt", belt_length))
+
+        if sum(size for _, size in segments) + len(segments) - 1 > height:
+            raise ValueError(f"{belts} belts and {charger_banks} charger banks do not fit in a height of {height}")
+
+        chargers = []
+        belt_layouts = []
+        y = 0
+        for kind, size in segments:
+            if kind == "chargers":
+                chargers.extend((width - 1, i) for i in range(y, y + size))
+            else:
+                path = [(width - 1, i) for i in range(y + size - 1, y - 1, -1)] + [(width - 2, y)]
+                belt_layouts.append(BeltLayout(path, (width - 3, y)))
+            y += size + 1
+
+        return cls(width, height, shelves, chargers, belt_layouts)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["width"], data["height"], data["shelves"], data["chargers"], data["belts"])
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "shelves": [[list(pos) for pos in row] for row in self.shelves],
+            "chargers": [list(pos) for pos in self.chargers],
+            "belts": [belt.to_dict() for belt in self.belts]
+        }
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un layout de almacén en formato JSON")
+    parser.add_argument("output")
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=200)
+    parser.add_argument("--belts", type=int, default=4)
+    parser.add_argument("--charger-banks", type=int, default=4)
+    parser.add_argument("--charger-bank-size", type=int, default=5)
+    parser.add_argument("--belt-length", type=int, default=7)
+    parser.add_argument("--block-length", type=int, default=10)
+    args = parser.parse_args()
+
+    layout = Layout.generate(args.width, args.height, args.belts, args.charger_banks, args.charger_bank_size,
+                             args.belt_length, args.block_length)
+    layout.save(args.output)
+    print(f"{args.output}: {layout.width}x{layout.height}, {sum(len(row) for row in layout.shelves)} shelves, "
+          f"{len(layout.belts)} belts, {len(layout.chargers)} chargers")
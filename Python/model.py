@@ -1,12 +1,32 @@
 from __future__ import division
+from collections import deque
+
 from mesa.model import Model
 from mesa.agent import Agent
 from mesa.space import MultiGrid
-from mesa.time import SimultaneousActivation
-from mesa.datacollection import DataCollector
-from heapq import heappush, heappop
 import numpy as np
 
+from chargers import ChargerManager
+from collector import ArrayCollector
+from dispatcher import Dispatcher
+from distance_fields import DistanceFields
+from events import ARRIVAL_DTYPE, EventLog, Replay
+from layout import Layout
+from pathfinding import RouteCache
+from profiler import StepProfiler
+from reservations import ReservationTable
+from scheduler import EventActivation
+from shelf_index import ShelfIndex
+import snapshot
+from spatial_index import RobotIndex
+import wire
+from zones import ZoneWorkers
+
+
+PLANNERS = (None, "reservation", "flow")
+DISPATCHERS = (None, "batch")
+CHARGING = (None, "managed")
+
 
 class Cell(Agent):
     def __init__(self, unique_id, model):
@@ -14,9 +34,9 @@ class Cell(Agent):
 
 
 class Box(Agent):
-    def __init__(self, unique_id, model, robot):
+    def __init__(self, unique_id, model, robot, peso):
         super().__init__(unique_id, model)
-        self.peso = np.random.randint(0, 10)
+        self.peso = peso
         self.robot = robot
 
 
@@ -28,69 +48,57 @@ class Shelf(Agent):
 
 
 class ConveyorBelt(Agent):
-    def __init__(self, unique_id, model):
+    def __init__(self, unique_id, model, belt=None, index=None):
         super().__init__(unique_id, model)
         self.is_empty = True
         self.box = None
         self.move = 0
+        # Solo la cabeza de cada banda tiene recorrido, celda de recogida e índice (para el registro de eventos)
+        self.path = belt.path if belt else None
+        self.pickup = belt.pickup if belt else None
+        self.index = index
 
     def find_nearest_robot(self, position):
-        distancias = []
-        for cell in self.model.grid.coord_iter():
-            cell_content, pos = cell
-            x, y = pos
-            for obj in cell_content:
-                if isinstance(obj, Robot):
-                    distancias.append([abs(position[0] - x) + abs(position[1] - y), pos])
+        robot = self.model.robot_index.nearest(position)
+        if robot is None:
+            return None
 
-        distancias.sort(key=lambda x: x[0])
+        celdas = self.model.grid.get_cell_list_contents(position)
+        robot.destination = [celda for celda in celdas if isinstance(celda, Cell)][0]
+        self.model.robot_index.discard(robot)
+        self.model.schedule.wake(robot)
 
-        while True:
-            if len(distancias) == 0:
-                return None
-
-            robot = \
-            [robot for robot in self.model.grid.get_cell_list_contents(distancias[0][1]) if isinstance(robot, Robot)][0]
-
-            if robot.battery > 25 and robot.destination is None:
-                celdas = self.model.grid.get_cell_list_contents(position)
-                robot.destination = [celda for celda in celdas if isinstance(celda, Cell)][0]
-
-                return robot
-
-            distancias.pop(0)
+        return robot
 
     def step(self):
+        # Con el despachador el robot (y el estante) se asignan en lote al final del paso, no aquí
+        dispatched = self.model.dispatcher is not None
         if self.is_empty:
-            if self.random.random() < self.model.box_percentage:
-                if self.pos == (12, 6):
-                    self.box = Box(self.model.box_id, self.model, self.find_nearest_robot((11, 6)))
-                    self.model.grid.place_agent(self.box, (self.pos[0] + 1, 12))
-                else:
-                    self.box = Box(self.model.box_id, self.model, self.find_nearest_robot((11, 10)))
-                    self.model.grid.place_agent(self.box, (self.pos[0] + 1, 12))
+            peso = self.model.next_box(self.index)
+            if peso is not None:
+                robot = None if dispatched else self.find_nearest_robot(self.pickup)
+                self.box = Box(self.model.box_id, self.model, robot, peso)
+                self.model.grid.place_agent(self.box, self.path[0])
+                self.model.events.arrival(self.model.steps, self.index, self.box.unique_id, peso)
+                if self.box.robot is not None:
+                    self.model.events.assignment(self.model.steps, self.box.unique_id, self.box.robot.unique_id)
 
                 self.is_empty = False
                 self.model.box_id += 1
-                self.move = 7
-        elif self.move == 1:
-            if self.pos == (12, 6):
-                self.model.grid.move_agent(self.box, (self.box.pos[0] - 1, self.box.pos[1]))
-            else:
-                self.model.grid.move_agent(self.box, (self.box.pos[0] + 1, self.box.pos[1]))
-            self.move -= 1
+                self.move = len(self.path) - 1
         elif self.move != 0:
-            if self.pos == (12, 6):
-                self.model.grid.move_agent(self.box, (self.box.pos[0], self.box.pos[1] - 1))
-            else:
-                self.model.grid.move_agent(self.box, (self.box.pos[0], self.box.pos[1] + 1))
+            self.model.grid.move_agent(self.box, self.path[len(self.path) - self.move])
             self.move -= 1
 
-        if not self.is_empty and self.box.robot is None:
-            if self.pos == (12, 6):
-                self.box.robot = self.find_nearest_robot((11, 6))
-            else:
-                self.box.robot = self.find_nearest_robot((11, 10))
+        if not self.is_empty and self.box.robot is None and not dispatched:
+            self.box.robot = self.find_nearest_robot(self.pickup)
+            if self.box.robot is not None:
+                self.model.events.assignment(self.model.steps, self.box.unique_id, self.box.robot.unique_id)
+
+    def idle(self):
+        # Caja parada en la cabeza esperando a su robot: la banda no hace nada hasta que se la llevan
+        return not self.is_empty and self.move == 0 and (self.box.robot is not None or
+                                                         self.model.dispatcher is not None)
 
 
 class Charger(Agent):
@@ -110,6 +118,13 @@ class Robot(Agent):
         self.box = None
         self.moves = 0
         self.waiting = False
+        # Con reservas: la ruta actual solo sirve para apartarse del camino de otro robot
+        self.moving_away = False
+        # Con el despachador: hueco de estante reservado para la caja que va a recoger o que lleva
+        self.shelf = None
+        # Con el gestor de cargadores: cargador reservado y si está esperando (o yendo) a cargar
+        self.charger = None
+        self.needs_charge = False
 
     def available_cells(self, position):
         return [neighbour for neighbour in self.model.grid.get_neighbors(position, moore=True, include_center=False) if
@@ -127,97 +142,75 @@ class Robot(Agent):
         self.destination = closest_shelf
 
     def find_closest_charger(self):
+        self.destination = self.closest_charger()
+
+        return self.destination
+
+    def closest_charger(self):
         closest_charger = None
         min_distance = float('inf')
         for charger in self.model.chargers:
+            # Con campos de distancia, la distancia real hasta quedar junto al cargador (0 si ya se está)
+            if self.model.fields is not None:
+                distance = self.model.fields.distance(self.pos, charger)
+                if distance is not None and distance < min_distance:
+                    min_distance = distance
+                    closest_charger = charger
+                continue
+
             distance = self.manhattan_distance(self.pos, charger)
             if distance and distance < min_distance:
                 min_distance = distance
                 closest_charger = charger
 
-        self.destination = closest_charger
-
         return closest_charger
 
     def manhattan_distance(self, a, b):
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
     def find_closest_unoccupied_shelf(self, shelves_row):
-        min_distance = float('inf')
-        closest_shelf = None
-        for pos in shelves_row:
-            contents = self.model.grid.get_cell_list_contents(pos)
-            if contents and contents[0].limit > 0 and contents[0].stored_box is None:
-                distance = self.manhattan_distance(self.pos, pos)
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_shelf = pos
-        return closest_shelf
-
-    def shortest_path(self, start, end, robot=None):
-        width, height = self.model.grid.width, self.model.grid.height
+        shelf_index = self.model.shelf_index
+        return shelf_index.nearest_in_row(shelf_index.row_of[shelves_row[0]][0], self.pos)
 
+    def shortest_path(self, start, end, robot=None, delay=0):
         start_pos = start.pos if hasattr(start, 'pos') else start
         end_pos = end.pos if hasattr(end, 'pos') else end
 
-        open_set = []
-        heappush(open_set, (0, start_pos))
-
-        came_from = {start_pos: None}
-        g_score = {start_pos: 0}
-        f_score = {start_pos: self.manhattan_distance(start_pos, end_pos)}
-
-        while open_set:
-            current = heappop(open_set)[1]
-
-            # Check if we have reached the goal position
-            if any(self.manhattan_distance(current, shelf_pos) == 1
-                   for shelf_row in self.model.shelves for shelf_pos in shelf_row) and self.box is not None:
-                end_pos = current
-
-            if any(self.manhattan_distance(current, charger_pos) == 1 for charger_pos in self.model.chargers):
-                end_pos = current
-
-            if current == end_pos:
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.reverse()
-                return path
-
-            for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-                neighbor = (current[0] + dx, current[1] + dy)
-
-                if 0 <= neighbor[0] < width and 0 <= neighbor[1] < height:
-                    if self.is_obstacle_or_robot(neighbor, robot):
-                        continue
-
-                    tentative_g_score = g_score[current] + 1
-
-                    if tentative_g_score < g_score.get(neighbor, float('inf')):
-                        came_from[neighbor] = current
-                        g_score[neighbor] = tentative_g_score
-                        f_score[neighbor] = tentative_g_score + self.manhattan_distance(neighbor, end_pos)
-                        if neighbor not in [item[1] for item in open_set]:
-                            heappush(open_set, (f_score[neighbor], neighbor))
-
-        return [-1]
+        # Con reservas la ruta empieza a recorrerse dentro de delay pasos (según quién la pide) y queda reservada
+        if self.model.reservations is not None:
+            self.moving_away = False
+            route = self.model.reservations.plan(self, start_pos, self.model.steps + delay, self.model.steps, end_pos)
+            if route == [-1]:
+                for blocker in self.model.reservations.requested:
+                    self.model.schedule.wake(blocker)
+            return route
+        # Con campos de distancia la ruta se sigue bajando por el campo del destino, sin A* (ni robots)
+        if self.model.fields is not None:
+            return self.model.fields.route(start_pos, end_pos)
+        # Al cargador reservado se va justo a su celda de carga, no a cualquier celda junto a un cargador
+        if self.charger is not None and end_pos == self.model.charger_manager.docks[self.charger]:
+            return self.model.pathfinder.exact_route(start_pos, end_pos)
+
+        return self.model.pathfinder.route(start_pos, end_pos, self.box is not None,
+                                           robot.pos if robot else None)
+
+    def keeps_route(self):
+        # Sin reservas la ruta al cargador se recalcula en cada paso, como en el modelo original. Con reservas se
+        # mantiene la ruta al cargador y cualquier ruta a medio recorrer: solo se planifica desde donde se está
+        # aparcado, para no dejar una celda ocupada por la que ya pasan otras rutas reservadas
+        if self.model.reservations is None or self.route in ([], [-1]):
+            return False
+        return self.destination in self.model.chargers or not self.at_route_end()
+
+    def at_route_end(self):
+        # Con reservas una ruta puede pasar por su última celda, dejarla libre para la reserva de otro robot y
+        # volver más tarde: solo ha llegado si lo que le queda de ruta es quedarse en ella
+        if self.pos != self.route[-1]:
+            return False
+        return self.model.reservations is None or all(cell == self.pos for cell in self.route[self.idx_rute:])
 
     def is_obstacle_or_robot(self, pos, robot=None):
-        for shelf_row in self.model.shelves:
-            if pos in shelf_row:
-                return True
-
-        if pos in self.model.chargers or pos in self.model.conveyor_belt:
-            return True
-
-        cell_contents = self.model.grid.get_cell_list_contents(pos)
-        for content in cell_contents:
-            if isinstance(content, Robot) and content != robot:
-                return True
-
-        return False
+        return self.model.pathfinder.is_blocked(pos, robot.pos if robot else None)
 
     def pickup_box(self):
         neighbors = self.model.grid.get_neighbors(self.pos, moore=False, include_center=False)
@@ -230,60 +223,57 @@ class Robot(Agent):
             self.waiting = False
         else:
             box = box[0]
-            belt = [belt for belt in neighbors if isinstance(belt, ConveyorBelt)][0]
+            belt = [belt for belt in neighbors if isinstance(belt, ConveyorBelt) and belt.box is box][0]
             self.box = box
 
             self.model.grid.remove_agent(box)
             belt.is_empty = True
+            self.model.schedule_cinta.wake(belt)
 
-            closest_shelves_index = None
-            min_distance_to_row = float('inf')
-
-            for i, shelf_row in enumerate(self.model.shelves):
-                shelf_available = False
-                for shelf_pos in shelf_row:
-                    shelf = self.get_shelf_at_pos(shelf_pos)
-                    if shelf and shelf.stored_box is None:
-                        shelf_available = True
-                        break
-                if shelf_available:
-                    distance_to_row = self.manhattan_distance(self.pos, shelf_row[0])
-                    if distance_to_row < min_distance_to_row:
-                        min_distance_to_row = distance_to_row
-                        closest_shelves_index = i
-
-            if closest_shelves_index is not None:
-                closest_shelf = self.find_closest_unoccupied_shelf(self.model.shelves[closest_shelves_index])
-                if closest_shelf:
-                    self.destination = closest_shelf
-                    self.route = self.shortest_path(self.pos, self.destination, self)
-                    if self.route and len(self.route) > 1:
-                        self.idx_rute = 1
-                        self.next_pos = self.route[self.idx_rute]
-                        self.idx_rute += 1
-                    else:
-                        self.next_pos = self.pos
+            # Con el despachador el hueco ya se reservó al asignar la caja
+            if self.model.dispatcher is not None:
+                closest_shelf = self.shelf
+            else:
+                closest_shelf = self.find_unoccupied_shelf()
+
+            if closest_shelf:
+                self.destination = closest_shelf
+                self.route = self.shortest_path(self.pos, self.destination, self)
+                if self.route and len(self.route) > 1:
+                    self.idx_rute = 1
+                    self.next_pos = self.route[self.idx_rute]
+                    self.idx_rute += 1
+                else:
+                    self.next_pos = self.pos
+                    # Con reservas, si ahora no hay hueco se vuelve a intentar al final de step()
+                    if self.model.reservations is not None and self.route == [-1]:
+                        self.route = []
+
+    def find_unoccupied_shelf(self):
+        # La fila más cercana con algún estante libre y, en ella, el estante libre más cercano
+        return self.model.shelf_index.nearest_free(self.pos)
 
     # Método auxiliar para obtener el estante en una posición dada
     def get_shelf_at_pos(self, pos):
-        contents = self.model.grid.get_cell_list_contents(pos)
-        for content in contents:
-            if isinstance(content, Shelf):
-                return content
-        return None
-
-    def drop_off(self):
-        neighbors = \
-        [neighbour for neighbour in self.model.grid.get_neighbors(self.pos, moore=False, include_center=False) if
-         isinstance(neighbour, Shelf)][0]
+        return self.model.shelf_index.at.get(pos)
 
-        neighbors.stored_box = self.box
+    def drop_off(self, shelf):
+        self.model.shelf_index.store(shelf, self.box)
+        self.model.boxes_stored += 1
+        if self.model.dispatcher is not None:
+            self.model.dispatcher.release(self)
         self.box = None
         self.destination = None
         self.route = []
         self.idx_rute = 0
+        # Con el gestor de cargadores, al terminar cada tarea el robot pide cargador si no le llega para otra
+        if self.model.charger_manager is not None:
+            self.model.charger_manager.check(self)
 
     def charging(self):
+        manager = self.model.charger_manager
+        if manager is not None:
+            manager.occupy(self)
         if self.battery + 20 < 100:
             self.battery += 20
         else:
@@ -291,28 +281,54 @@ class Robot(Agent):
             self.destination = None
             self.route = []
             self.idx_rute = 0
+            if manager is not None:
+                manager.release(self)
+
+        self.model.robot_index.update(self)
+
+    def move_away(self):
+        # Un robot sin destino que bloquea la llegada de otro se aparta (solo con reservas)
+        reservations = self.model.reservations
+        if self.destination is None and not self.route and self in reservations.requested:
+            route = reservations.move_away(self, self.pos, self.model.steps + 1, self.model.steps,
+                                           self.model.layout.pickup_points)
+            if route != [-1]:
+                self.route = route
+                self.idx_rute = 0
+                self.moving_away = True
 
     def step(self):
-        if self.destination is None or self.destination in self.model.chargers:
-            if self.box is None and self.battery <= 25:
+        manager = self.model.charger_manager
+        if self.model.reservations is not None:
+            self.move_away()
+
+        if manager is None and (self.destination is None or self.destination in self.model.chargers):
+            if self.box is None and self.battery <= 25 and not self.keeps_route():
                 charging_station = self.find_closest_charger()
                 if charging_station:
-                    self.route = self.shortest_path(self.pos, charging_station)
+                    self.route = self.shortest_path(self.pos, charging_station, delay=1)
                     self.idx_rute = 0
 
         if self.route:
-            if self.pos == self.route[-1]:
-                if self.pos == (11, 6) and self.box is None:
+            at_end = self.at_route_end()
+            if at_end and self.moving_away:
+                self.route = []
+                self.idx_rute = 0
+                self.moving_away = False
+            elif at_end:
+                if self.pos in self.model.layout.pickup_points and self.box is None:
                     self.pickup_box()
                 elif self.pos in self.model.chargers:
                     self.charging()
+                elif self.charger is not None and self.pos == manager.docks[self.charger]:
+                    self.charging()
                 else:
                     neighbors = self.model.grid.get_neighbors(self.pos, moore=False, include_center=False)
 
                     for neighbor in neighbors:
                         if isinstance(neighbor,
                                       Shelf) and neighbor.stored_box is None and self.destination == neighbor.pos:
-                            self.drop_off()
+                            self.drop_off(neighbor)
             elif self.idx_rute < len(self.route):
                 self.next_pos = self.route[self.idx_rute]
                 self.idx_rute += 1
@@ -320,40 +336,95 @@ class Robot(Agent):
                 self.next_pos = self.pos
                 self.idx_rute = 0
 
+        # Con el gestor de cargadores un robot libre que se queda sin batería (al apartarse) también pide cargador
+        if manager is not None and self.destination is None and self.box is None and self.battery <= 25:
+            manager.check(self)
+
         if self.destination and not self.route:
-            self.route = self.shortest_path(self.pos, self.destination)
+            self.route = self.shortest_path(self.pos, self.destination, delay=2)
             if self.route == [-1]:
                 self.route = []
 
             self.idx_rute = 0
 
+    def route_query(self):
+        # La búsqueda (inicio, destino, con caja, celda ignorada) que hará pathfinder.shortest_path en el siguiente
+        # step() de este robot, según su estado antes del paso, o None: la de ir al cargador, la de ir al destino
+        # recién asignado o, en la celda de recogida con la caja ya en la banda, la de llevarla al estante. Solo
+        # sirve para adelantarla (zones.py); si step() acaba buscando otra ruta, esta no se usa.
+        manager = self.model.charger_manager
+        if manager is None and (self.destination is None or self.destination in self.model.chargers):
+            if self.box is None and self.battery <= 25 and not self.keeps_route():
+                charger = self.closest_charger()
+                return (self.pos, charger, False, None) if charger else None
+
+        if self.route:
+            if self.box is None and not self.waiting and self.pos in self.model.layout.pickup_points and \
+                    self.pos == self.route[-1]:
+                neighbors = self.model.grid.get_neighbors(self.pos, moore=False, include_center=False)
+                if any(isinstance(neighbor, Box) for neighbor in neighbors):
+                    shelf_index = self.model.shelf_index
+                    if self.model.dispatcher is not None:
+                        shelf = self.shelf
+                    else:
+                        row_index = shelf_index.nearest_row(self.pos)
+                        shelf = shelf_index.nearest_in_row(row_index, self.pos) if row_index is not None else None
+                    return (self.pos, shelf, True, self.pos) if shelf else None
+            return None
+
+        # La celda de carga del gestor se busca con exact_route, no con esta búsqueda
+        if self.destination and (self.charger is None or self.destination != manager.docks[self.charger]):
+            destination = self.destination.pos if hasattr(self.destination, 'pos') else self.destination
+            return (self.pos, destination, self.box is not None, None)
+        return None
+
+    def idle(self):
+        # Sin destino, ruta ni caja, con batería y quieto: step() y advance() no hacen nada hasta que se le asigna
+        # una caja, se le pide que se aparte o (sin reservas) otro robot va a su celda
+        reservations = self.model.reservations
+        return self.destination is None and not self.route and self.box is None and self.battery > 25 and \
+            self.next_pos == self.pos and not self.waiting and \
+            (reservations is None or self not in reservations.requested)
+
     def advance(self):
-        neighbours = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False)
-        other_robots = [neighbour for neighbour in neighbours if isinstance(neighbour, Robot)]
+        # Con reservas las rutas ya no chocan y no hace falta revisar a los vecinos. Sin robots alrededor (según la
+        # capa de robots, que está al día) tampoco hace falta preguntar al grid.
+        if self.model.reservations is None and self.model.pathfinder.robots_around(self.pos):
+            self.model.neighbour_queries += 1
+            neighbours = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False)
+            other_robots = [neighbour for neighbour in neighbours if isinstance(neighbour, Robot)]
+        else:
+            other_robots = []
 
         for robot in other_robots:
             if robot.next_pos == self.next_pos:
                 if self.destination is None:
                     y = self.pos[1]
-                    if y in [1, 5, 10]:
+                    if y in self.model.layout.nudge_up_rows:
                         self.next_pos = (self.pos[0], self.pos[1] + 1)
                     else:
                         self.next_pos = (self.pos[0], self.pos[1] - 1)
                 elif robot.destination is None:
                     y = robot.pos[1]
-                    if y in [1, 5, 10]:
+                    if y in self.model.layout.nudge_up_rows:
                         robot.next_pos = (robot.pos[0], self.pos[1] + 1)
                     else:
                         robot.next_pos = (robot.pos[0], self.pos[1] - 1)
+                    self.model.schedule.touch(robot.next_pos)
 
-        if isinstance(self.next_pos, tuple) and len(self.next_pos) == 2:
+        if isinstance(self.next_pos, tuple) and len(self.next_pos) == 2 and \
+                not self.model.grid.out_of_bounds(self.next_pos):
             if self.pos != self.next_pos:
                 self.moves += 1
                 self.battery -= 0.5
+                self.model.pathfinder.move_robot(self.pos, self.next_pos)
                 self.model.grid.move_agent(self, self.next_pos)
+                self.model.schedule.touch(self.pos)
         else:
             self.next_pos = self.pos
 
+        self.model.robot_index.update(self)
+
 
 def get_robot_data(model):
     robot_data = []
@@ -384,13 +455,12 @@ def get_conveyor_belt_data(model):
 # Function to collect data about shelves
 def get_shelf_data(model):
     shelf_data = []
-    for agent in model.schedule.agents:
-        if isinstance(agent, Shelf):
-            shelf_data.append({
-                "unique_id": agent.unique_id,
-                "position": agent.pos,
-                "stored_box": agent.stored_box.unique_id if agent.stored_box else None
-            })
+    for agent in model.shelf_agents:
+        shelf_data.append({
+            "unique_id": agent.unique_id,
+            "position": agent.pos,
+            "stored_box": agent.stored_box.unique_id if agent.stored_box else None
+        })
     return shelf_data
 
 
@@ -433,57 +503,96 @@ def get_charger_data(model):
 
 
 class Warehouse(Model):
-    def __init__(self, num_robots, box_percentage):
+    def __init__(self, num_robots, box_percentage, layout=None, collect_data=True, route_cache=None, seed=None,
+                 replay=None, planner=None, dispatch=None, charging=None, zones=None, collect_max_steps=None,
+                 collect_spill_dir=None):
+        if planner not in PLANNERS:
+            raise ValueError(f"Unknown planner {planner!r}, expected one of {PLANNERS}")
+        if dispatch not in DISPATCHERS:
+            raise ValueError(f"Unknown dispatch {dispatch!r}, expected one of {DISPATCHERS}")
+        if charging not in CHARGING:
+            raise ValueError(f"Unknown charging {charging!r}, expected one of {CHARGING}")
+        if zones is not None and zones < 1:
+            raise ValueError("zones must be at least 1")
+        if zones is not None and (planner is not None or route_cache):
+            raise ValueError("zones only plans the A* routes of planner=None without route_cache")
+
+        # Toda la aleatoriedad sale de self.random; seed la fija (Mesa solo la ve si se pasa por nombre)
+        if seed is not None:
+            self._seed = seed
+            self.random.seed(seed)
+        # Con replay (un EventLog) las cajas llegan a las bandas según el registro en lugar de al azar
+        self.replay = Replay(replay) if replay is not None else None
+        self.events = EventLog(self._seed, num_robots, box_percentage)
+        self.steps = 0
+
         self.num_robots = num_robots
         self.box_percentage = box_percentage
-        self.shelves = [[(i, 0) for i in range(2, 7)], [(i, 3) for i in range(2, 7)], [(i, 4) for i in range(2, 7)],
-                        [(i, 8) for i in range(2, 7)], [(i, 9) for i in range(2, 7)], [(i, 12) for i in range(2, 7)]]
-        self.conveyor_belt = [(12, 6)]
-        self.conveyor_belt.extend([(13, i) for i in range(6, 13)])
-        self.chargers = [(13, i) for i in range(0, 5)]
+        self.collect_data = collect_data
+        self.boxes_stored = 0
+        self.layout = layout if layout is not None else Layout.default()
+        self.shelves = self.layout.shelves
+        self.conveyor_belt = self.layout.conveyor_belt
+        self.chargers = self.layout.chargers
         self.box_id = 1000
+        self.neighbour_queries = 0
+        self.profiler = StepProfiler()
+        # Pasos ya ejecutados que el servicio todavía no ha entregado (prefetch.py): (paso, estado, fotograma de
+        # wire.py). Van en los snapshots para que al restaurar se sirvan igual.
+        self.prefetched = deque()
 
         # Creación del Grid
-        self.grid = MultiGrid(14, 13, False)
-        self.schedule = SimultaneousActivation(self)
-        self.schedule_cinta = SimultaneousActivation(self)
+        self.grid = MultiGrid(self.layout.width, self.layout.height, False)
+        # Solo se activan los agentes con algo que hacer (scheduler.py); el resultado es el de SimultaneousActivation
+        self.schedule = EventActivation(self, cells=planner != "reservation")
+        self.schedule_cinta = EventActivation(self)
 
-        available_positions = [pos for _, pos in self.grid.coord_iter()]
+        # Celdas libres y mapa estático calculados una vez por layout (Layout.static())
+        static = self.layout.static()
+        available_positions = static.free_cells
 
         key = 0
+        self.shelf_agents = []
         for shelf_pos in self.shelves:
             for pos in shelf_pos:
                 shelf = Shelf(key, self)
                 key += 1
                 self.grid.place_agent(shelf, pos)
                 self.schedule.add(shelf)
-                available_positions.remove(pos)
+                self.shelf_agents.append(shelf)
 
-        for pos in self.conveyor_belt:
-            belt = ConveyorBelt(key, self)
-            key += 1
-            self.grid.place_agent(belt, pos)
-
-            if pos == (12, 6):
-                self.schedule_cinta.add(belt)
+        for index, belt_layout in enumerate(self.layout.belts):
+            for pos in belt_layout.cells:
+                if pos == belt_layout.head:
+                    belt = ConveyorBelt(key, self, belt_layout, index)
+                else:
+                    belt = ConveyorBelt(key, self)
+                key += 1
+                self.grid.place_agent(belt, pos)
 
-            available_positions.remove(pos)
+                if pos == belt_layout.head:
+                    self.schedule_cinta.add(belt)
 
+        self.charger_agents = []
         for pos in self.chargers:
             charger = Charger(key, self)
             key += 1
             self.grid.place_agent(charger, pos)
             self.schedule.add(charger)
-            available_positions.remove(pos)
+            self.charger_agents.append(charger)
 
         pos_robots = self.random.sample(available_positions, self.num_robots)
 
+        self.pickup_cells = {}
         for pos in available_positions:
             celda = Cell(key, self)
             key += 1
             self.grid.place_agent(celda, pos)
+            if pos in self.layout.pickup_points:
+                self.pickup_cells[pos] = celda
 
         robots = []
+        self.robots = []
 
         for pos in pos_robots:
             x_rob, y_rob = pos
@@ -497,17 +606,296 @@ class Warehouse(Model):
             key += 1
             self.grid.place_agent(robot, pos)
             self.schedule.add(robot)
-            available_positions.remove(pos)
-
-        self.datacollector = DataCollector(
-            model_reporters={
-                "Robots": get_robot_data,
-                "ConveyorBelts": get_conveyor_belt_data,
-                "Shelves": get_shelf_data,
-                "Boxes": get_box_data,
-                "Chargers": get_charger_data
-            }
-        )
+            self.robots.append(robot)
+
+        self.robot_index = RobotIndex(self.grid.width, self.grid.height)
+        for robot in self.robots:
+            self.robot_index.update(robot)
+
+        # La capa de robots del PathFinder se mantiene al día en advance() en lugar de reconstruirse en cada paso
+        self.pathfinder = static.pathfinder.copy()
+        self.pathfinder.update_robots(robot.pos for robot in self.robots)
+        # Con el gestor de cargadores y A* las rutas terminan en su destino, no junto a cualquier cargador (con
+        # reservas esas celdas siguen marcadas para que los robots que se apartan no se queden en ellas)
+        if charging == "managed" and planner is None:
+            self.pathfinder.drop_charger_goals()
+        # planner="flow": campos de distancia BFS de las recogidas y los cargadores (y de los huecos al pedirlos)
+        # para las distancias reales y las rutas
+        self.fields = None
+        if planner == "flow":
+            self.fields = DistanceFields(self.pathfinder, sorted(self.layout.pickup_points) + self.chargers,
+                                         shared=static.fields)
+        self.shelf_index = self.build_shelf_index()
+        # route_cache: número de rutas a cachear (None desactiva la caché y cada ruta es un A* completo)
+        if route_cache:
+            self.pathfinder.cache = RouteCache(route_cache)
+
+        # planner="reservation": rutas sin choques con reservas (celda, paso); "flow": rutas por los campos de
+        # distancia; None: A* con el desvío en advance()
+        self.planner = planner
+        self.reservations = None
+        if planner == "reservation":
+            self.reservations = ReservationTable(self.pathfinder)
+            for robot in self.robots:
+                self.reservations.park(robot, robot.pos, self.steps)
+
+        # dispatch="batch": cajas, robots y estantes se reparten en lote en cada paso; None: el robot más cercano
+        self.dispatch = dispatch
+        self.dispatcher = Dispatcher(self, static.dispatch) if dispatch == "batch" else None
+        # charging="managed": cargadores reservados, cola de espera y carga anticipada (chargers.py); None: cada
+        # robot con batería baja va al cargador más cercano
+        self.charging = charging
+        self.charger_manager = ChargerManager(self) if charging == "managed" else None
+
+        # Historial de collect_data: collect_max_steps conserva solo los últimos pasos (por bloques) y
+        # collect_spill_dir vuelca cada bloque lleno a disco (ArrayCollector)
+        self.datacollector = ArrayCollector(self, max_steps=collect_max_steps, spill_dir=collect_spill_dir)
+
+        # zones=N: las búsquedas A* de cada paso se adelantan en N procesos, uno por zona del grid (zones.py); el
+        # resultado es el mismo que sin zonas
+        self.zones = zones
+        self.zone_workers = ZoneWorkers(self, zones) if zones is not None else None
+
+    def close(self):
+        # Para los procesos de zones, si los hay (el almacén sigue funcionando sin ellos)
+        if self.zone_workers is not None:
+            self.zone_workers.close()
+            self.zone_workers = None
+
+    def fork(self, num_robots=None, seed=None, **kwargs):
+        # Simulación nueva (paso 0) con el mismo layout y la misma configuración, cambiando lo que se pase (otra
+        # semilla, otro número de robots...). La parte estática del layout ya está calculada y no se repite. El
+        # directorio de volcado del colector no se hereda: dos simulaciones escribirían los mismos ficheros.
+        settings = {
+            "box_percentage": self.box_percentage,
+            "collect_data": self.collect_data,
+            "route_cache": self.pathfinder.cache.max_routes if self.pathfinder.cache is not None else None,
+            "planner": self.planner,
+            "dispatch": self.dispatch,
+            "charging": self.charging,
+            "zones": self.zones,
+            "collect_max_steps": self.datacollector.max_steps
+        }
+        settings.update(kwargs)
+        return type(self)(self.num_robots if num_robots is None else num_robots, layout=self.layout, seed=seed,
+                          **settings)
+
+    @classmethod
+    def from_log(cls, log, layout=None, **kwargs):
+        # Repite la corrida registrada en log (mismo layout y misma lógica dan el mismo resultado exacto)
+        return cls(log.num_robots, log.box_percentage, layout, seed=log.seed, replay=log, **kwargs)
+
+    def save(self, file):
+        # Snapshot binario y versionado del estado (formato en snapshot.py); el historial del colector no se guarda
+        boxes = {}
+        for box in [robot.box for robot in self.robots] + [belt.box for belt in self.schedule_cinta.agents] + \
+                [shelf.stored_box for shelf in self.shelf_agents]:
+            if box is not None:
+                boxes[box.unique_id] = box
+        boxes = list(boxes.values())
+
+        def box_ids(items):
+            return np.array([box.unique_id if box is not None else -1 for box in items], dtype=np.int32)
+
+        next_state, next_pos = snapshot.pack_positions([robot.next_pos for robot in self.robots])
+        shelf_state, shelf = snapshot.pack_positions([robot.shelf for robot in self.robots])
+        destination_state, destination = snapshot.pack_positions(
+            [robot.destination.pos if isinstance(robot.destination, Agent) else robot.destination
+             for robot in self.robots])
+        rng_header, rng_state = snapshot.pack_rng(self.random)
+        belts = self.schedule_cinta.agents
+
+        arrays = {
+            "robot_ids": np.array([robot.unique_id for robot in self.robots], dtype=np.int32),
+            "robot_pos": np.array([robot.pos for robot in self.robots], dtype=np.int32).reshape(-1, 2),
+            "next_state": next_state,
+            "next_pos": next_pos,
+            "destination_state": destination_state,
+            "destination": destination,
+            "destination_is_cell": np.array([isinstance(robot.destination, Cell) for robot in self.robots]),
+            "idx_rute": np.array([robot.idx_rute for robot in self.robots], dtype=np.int32),
+            "battery": np.array([robot.battery for robot in self.robots], dtype=np.float64),
+            "battery_is_int": np.array([isinstance(robot.battery, int) for robot in self.robots]),
+            "moves": np.array([robot.moves for robot in self.robots], dtype=np.int64),
+            "waiting": np.array([robot.waiting for robot in self.robots]),
+            "moving_away": np.array([robot.moving_away for robot in self.robots]),
+            "shelf_state": shelf_state,
+            "shelf": shelf,
+            "robot_box": box_ids(robot.box for robot in self.robots),
+            "box_ids": box_ids(boxes),
+            "box_weight": np.array([box.peso for box in boxes], dtype=np.int8),
+            "box_robot": np.array([box.robot.unique_id if box.robot else -1 for box in boxes], dtype=np.int32),
+            "box_on_grid": np.array([box.pos is not None for box in boxes]),
+            "box_pos": np.array([box.pos or (0, 0) for box in boxes], dtype=np.int32).reshape(-1, 2),
+            "belt_is_empty": np.array([belt.is_empty for belt in belts]),
+            "belt_box": box_ids(belt.box for belt in belts),
+            "belt_move": np.array([belt.move for belt in belts], dtype=np.int32),
+            "shelf_box": box_ids(shelf.stored_box for shelf in self.shelf_agents),
+            "charger_occupied": np.array([charger.is_occupied for charger in self.charger_agents]),
+            "rng_state": rng_state,
+            **snapshot.pack_routes([robot.route for robot in self.robots]),
+            **self.events.arrays()
+        }
+        if self.replay is not None:
+            arrays["replay_arrivals"] = np.array(self.replay.remaining(), dtype=ARRIVAL_DTYPE)
+        if self.reservations is not None:
+            arrays.update(self.reservations.arrays())
+        if self.charger_manager is not None:
+            charger_state, charger = snapshot.pack_positions([robot.charger for robot in self.robots])
+            arrays.update(self.charger_manager.arrays(), charger_state=charger_state, charger=charger,
+                          needs_charge=np.array([robot.needs_charge for robot in self.robots]))
+        if self.prefetched:
+            frames = [frame for _, _, frame in self.prefetched]
+            arrays.update(prefetched_frames=np.frombuffer(b"".join(frames), dtype=np.uint8),
+                          prefetched_sizes=np.array([len(frame) for frame in frames], dtype=np.int64))
+
+        header = {
+            "num_robots": self.num_robots,
+            "box_percentage": self.box_percentage,
+            "collect_data": self.collect_data,
+            "route_cache": self.pathfinder.cache.max_routes if self.pathfinder.cache is not None else None,
+            "seed": self._seed,
+            "planner": self.planner,
+            "dispatch": self.dispatch,
+            "charging": self.charging,
+            "zones": self.zones,
+            "collect_max_steps": self.datacollector.max_steps,
+            "reservation_failures": self.reservations.failures if self.reservations is not None else 0,
+            "box_id": self.box_id,
+            "boxes_stored": self.boxes_stored,
+            "steps": self.steps,
+            "layout": self.layout.to_dict(),
+            **rng_header
+        }
+        snapshot.write(file, "Warehouse", header, arrays)
+
+    @classmethod
+    def load(cls, file):
+        header, arrays = snapshot.read(file, "Warehouse")
+        model = cls(header["num_robots"], header["box_percentage"], Layout.from_dict(header["layout"]),
+                    header["collect_data"], header["route_cache"], seed=header["seed"], planner=header["planner"],
+                    dispatch=header.get("dispatch"), charging=header.get("charging"), zones=header.get("zones"),
+                    collect_max_steps=header.get("collect_max_steps"))
+        model.restore(header, arrays)
+        return model
+
+    def restore(self, header, arrays):
+        # Recién construido con los mismos parámetros y layout, los unique_id coinciden con los del snapshot
+        if arrays["robot_ids"].tolist() != [robot.unique_id for robot in self.robots]:
+            raise snapshot.SnapshotError("Snapshot robots do not match the rebuilt warehouse")
+
+        robots = {robot.unique_id: robot for robot in self.robots}
+        boxes = {-1: None}
+        for unique_id, weight, robot, on_grid, pos in zip(arrays["box_ids"].tolist(), arrays["box_weight"].tolist(),
+                                                          arrays["box_robot"].tolist(), arrays["box_on_grid"].tolist(),
+                                                          arrays["box_pos"].tolist()):
+            box = Box(unique_id, self, robots.get(robot), weight)
+            if on_grid:
+                self.grid.place_agent(box, tuple(pos))
+            boxes[unique_id] = box
+
+        routes = snapshot.unpack_routes(arrays)
+        for i, robot in enumerate(self.robots):
+            self.grid.move_agent(robot, tuple(arrays["robot_pos"][i].tolist()))
+            robot.next_pos = snapshot.unpack_position(arrays["next_state"][i], arrays["next_pos"][i])
+            robot.destination = snapshot.unpack_position(arrays["destination_state"][i], arrays["destination"][i])
+            if arrays["destination_is_cell"][i]:
+                robot.destination = [agent for agent in self.grid.get_cell_list_contents(robot.destination)
+                                     if isinstance(agent, Cell)][0]
+            robot.route = routes[i]
+            robot.idx_rute = int(arrays["idx_rute"][i])
+            robot.battery = float(arrays["battery"][i])
+            if arrays["battery_is_int"][i]:
+                robot.battery = int(robot.battery)
+            robot.moves = int(arrays["moves"][i])
+            robot.waiting = bool(arrays["waiting"][i])
+            robot.moving_away = bool(arrays["moving_away"][i])
+            if "shelf_state" in arrays:
+                robot.shelf = snapshot.unpack_position(arrays["shelf_state"][i], arrays["shelf"][i])
+            if self.charger_manager is not None:
+                robot.charger = snapshot.unpack_position(arrays["charger_state"][i], arrays["charger"][i])
+                robot.needs_charge = bool(arrays["needs_charge"][i])
+            robot.box = boxes[int(arrays["robot_box"][i])]
+
+        for i, belt in enumerate(self.schedule_cinta.agents):
+            belt.is_empty = bool(arrays["belt_is_empty"][i])
+            belt.box = boxes[int(arrays["belt_box"][i])]
+            belt.move = int(arrays["belt_move"][i])
+        for shelf, box in zip(self.shelf_agents, arrays["shelf_box"].tolist()):
+            shelf.stored_box = boxes[box]
+        self.shelf_index = self.build_shelf_index()
+        for charger, occupied in zip(self.charger_agents, arrays["charger_occupied"].tolist()):
+            charger.is_occupied = occupied
+
+        self.robot_index = RobotIndex(self.grid.width, self.grid.height)
+        for robot in self.robots:
+            self.robot_index.update(robot)
+        self.pathfinder.update_robots(robot.pos for robot in self.robots)
+
+        self.box_id = header["box_id"]
+        self.steps = header["steps"]
+        if self.reservations is not None:
+            self.reservations.restore(arrays, robots, header["reservation_failures"])
+        if self.dispatcher is not None:
+            self.dispatcher.restore(self.robots)
+        if self.charger_manager is not None:
+            self.charger_manager.restore(robots, arrays)
+
+        self.boxes_stored = header["boxes_stored"]
+        for schedule in (self.schedule, self.schedule_cinta):
+            schedule.steps = schedule.time = self.steps
+        snapshot.unpack_rng(self.random, header, arrays["rng_state"])
+
+        self.events = EventLog.from_arrays(self.events.params(), arrays["arrivals"], arrays["assignments"])
+        if "replay_arrivals" in arrays:
+            self.replay = Replay(EventLog.from_arrays(self.events.params(), arrays["replay_arrivals"],
+                                                      arrays["assignments"][:0]))
+        # El historial empieza en el paso restaurado, con los mismos límites; si vuelca a disco sigue la numeración
+        # de los bloques ya escritos
+        collector = self.datacollector
+        self.datacollector = ArrayCollector(self, max_steps=collector.max_steps, spill_dir=collector.spill_dir,
+                                            start_step=self.steps)
+        self.datacollector.spilled = collector.spilled
+
+        # El estado de cada paso pendiente se recupera de su fotograma (wire.decode da collect_detailed_data())
+        self.prefetched = deque()
+        if "prefetched_frames" in arrays:
+            data = arrays["prefetched_frames"].tobytes()
+            offset = 0
+            for size in arrays["prefetched_sizes"].tolist():
+                frame = data[offset:offset + size]
+                offset += size
+                step, state = wire.decode(wire.HEADER + frame)[0]
+                self.prefetched.append((step, state, frame))
+
+    def build_shelf_index(self):
+        return ShelfIndex(self.shelves, self.shelf_agents, self.fields.distance if self.fields is not None else None)
+
+    def next_box(self, belt_index):
+        # Peso de la caja que llega a la banda en este paso, o None si no llega ninguna
+        if self.replay is not None:
+            return self.replay.next_arrival(self.steps, belt_index)
+        if self.random.random() < self.box_percentage:
+            return self.random.randrange(10)
+        return None
+
+    def collector_state(self):
+        robots = {
+            "unique_id": [robot.unique_id for robot in self.robots],
+            "x": [robot.pos[0] for robot in self.robots],
+            "y": [robot.pos[1] for robot in self.robots],
+            "battery": [robot.battery for robot in self.robots],
+            "has_box": [robot.box is not None for robot in self.robots]
+        }
+        shelves = [shelf.stored_box is not None for shelf in self.shelf_agents]
+
+        boxes = [(belt.box.unique_id, belt.box.pos[0], belt.box.pos[1],
+                  belt.box.robot.unique_id if belt.box.robot else -1)
+                 for belt in self.schedule_cinta.agents if belt.box is not None and belt.box.pos is not None]
+        boxes.extend((robot.box.unique_id, robot.pos[0], robot.pos[1], robot.unique_id)
+                     for robot in self.robots if robot.box is not None)
+
+        return robots, shelves, boxes
 
     def collect_detailed_data(self):
         step_data = {
@@ -519,10 +907,79 @@ class Warehouse(Model):
         }
         return step_data
 
+    def counters(self):
+        # Sin caché de rutas sus contadores quedan a 0
+        cache = self.pathfinder.cache
+        stats = cache.stats() if cache is not None else {}
+        return {
+            "path_searches": self.pathfinder.searches,
+            "nodes_expanded": self.pathfinder.expanded,
+            "neighbour_queries": self.neighbour_queries,
+            "robot_searches": self.robot_index.queries,
+            "route_cache_hits": stats.get("hits", 0),
+            "route_cache_misses": stats.get("misses", 0),
+            "route_cache_repairs": stats.get("repairs", 0),
+            "route_cache_fallbacks": stats.get("fallbacks", 0)
+        }
+
+    def fast_forward(self, steps, sample_every=None, collect=None):
+        # Avanza steps pasos sin recoger datos y devuelve [(paso, collect_detailed_data())] cada sample_every
+        # pasos y al final; collect(model) cambia lo que se guarda de cada muestra
+        collect = collect if collect is not None else Warehouse.collect_detailed_data
+        collect_data = self.collect_data
+        self.collect_data = False
+        samples = []
+        done = 0
+        try:
+            for done in range(1, steps + 1):
+                self.step()
+                if done == steps or (sample_every and done % sample_every == 0):
+                    samples.append((self.steps, collect(self)))
+        finally:
+            self.collect_data = collect_data
+            if collect_data:
+                self.datacollector.skip(done)
+        return samples
+
     def step(self):
-        self.datacollector.collect(self)
-        self.schedule.step()
+        # Con el profiler activo se mide cada fase por separado (step y advance de los robots incluidos)
+        profiler = self.profiler if self.profiler.enabled else None
+        if profiler:
+            profiler.begin(self)
+
+        if self.collect_data:
+            self.datacollector.collect(self)
+        if profiler:
+            profiler.mark("collect")
+
+        zone_workers = self.zone_workers
+        if profiler is None and zone_workers is None:
+            self.schedule.step()
+        else:
+            self.schedule.begin()
+            # Con zonas, las búsquedas que harán los robots despiertos se calculan antes en paralelo; solo valen
+            # mientras nadie se mueve
+            if zone_workers is not None:
+                zone_workers.plan()
+            self.schedule.run("step")
+            if zone_workers is not None:
+                self.pathfinder.planned = {}
+            if profiler:
+                profiler.mark("robots_step")
+            self.schedule.run("advance")
+            self.schedule.finish()
+            if profiler:
+                profiler.mark("robots_advance")
+
         self.schedule_cinta.step()
+        if profiler:
+            profiler.mark("belts_step")
+
+        if self.dispatcher is not None:
+            self.dispatcher.step()
+        self.steps += 1
+        if profiler:
+            profiler.end(self, "dispatch")
 
 
 def get_grid(model: Model) -> np.ndarray:
@@ -0,0 +1,259 @@
+from collections import OrderedDict
+from copy import copy
+from heapq import heappush, heappop
+
+import numpy as np
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def adjacent_mask(width, height, positions):
+    # Celdas a distancia Manhattan 1 de alguna de las posiciones dadas
+    mask = np.zeros((width, height), dtype=bool)
+    for x, y in positions:
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                mask[nx, ny] = True
+    return mask
+
+
+# A* sobre un mapa estático que se calcula una sola vez por almacén: static marca
+# estantes, cargadores y banda; shelf_goal y charger_goal marcan las celdas donde
+# termina una ruta. La capa robots (cuántos robots hay en cada celda) se crea con
+# update_robots() y move_robot() la mantiene al día con cada movimiento.
+class PathFinder:
+    def __init__(self, width, height, shelves, chargers, conveyor_belt):
+        self.width = width
+        self.height = height
+
+        shelf_positions = [pos for row in shelves for pos in row]
+
+        self.static = np.zeros((width, height), dtype=bool)
+        for pos in shelf_positions + list(chargers) + list(conveyor_belt):
+            self.static[pos] = True
+
+        self.shelf_goal = adjacent_mask(width, height, shelf_positions)
+        self.charger_goal = adjacent_mask(width, height, chargers)
+        self.robots = np.zeros((width, height), dtype=np.int32)
+
+        # Copias planas (índice x * height + y) para el bucle de búsqueda
+        self._blocked = self.static.ravel().tolist()
+        self._goal = self.charger_goal.ravel().tolist()
+        self._carry_goal = (self.charger_goal | self.shelf_goal).ravel().tolist()
+        self._robots = [0] * (width * height)
+
+        # searches y expanded cuentan búsquedas A* y nodos expandidos
+        self.searches = 0
+        self.expanded = 0
+        self.cache = None
+        # Búsquedas del paso actual ya hechas en otro proceso (zones.py): (inicio, destino, con caja, celda
+        # ignorada) -> (ruta, nodos expandidos)
+        self.planned = {}
+
+    def copy(self):
+        # Otro PathFinder con el mismo mapa estático, sin caché ni contadores; las capas de destino, que no cambian,
+        # se comparten
+        pathfinder = copy(self)
+        pathfinder.static = self.static.copy()
+        pathfinder._blocked = list(self._blocked)
+        pathfinder.robots = np.zeros_like(self.robots)
+        pathfinder._robots = [0] * (self.width * self.height)
+        pathfinder.searches = 0
+        pathfinder.expanded = 0
+        pathfinder.cache = None
+        pathfinder.planned = {}
+        return pathfinder
+
+    def update_robots(self, positions):
+        self.robots[:] = 0
+        for pos in positions:
+            self.robots[pos] += 1
+        self._robots = self.robots.ravel().tolist()
+
+    def move_robot(self, old, new):
+        # Mantiene la capa de robots al día con un movimiento, sin reconstruirla
+        self.robots[old] -= 1
+        self.robots[new] += 1
+        self._robots[old[0] * self.height + old[1]] -= 1
+        self._robots[new[0] * self.height + new[1]] += 1
+
+    def robots_around(self, pos):
+        # Robots en las (hasta) 8 celdas vecinas de pos según la capa de robots
+        x, y = pos
+        height = self.height
+        robots = self._robots
+        total = 0
+        for nx in range(max(x - 1, 0), min(x + 2, self.width)):
+            for ny in range(max(y - 1, 0), min(y + 2, height)):
+                total += robots[nx * height + ny]
+        return total - robots[x * height + y]
+
+    def is_blocked(self, pos, ignore=None):
+        idx = pos[0] * self.height + pos[1]
+        occupied = self._robots[idx] - (1 if ignore == pos else 0)
+        return self._blocked[idx] or occupied > 0
+
+    def shortest_path(self, start, end, carrying=False, ignore=None):
+        self.searches += 1
+        planned = self.planned.get((start, end, carrying, ignore)) if self.planned else None
+        if planned is not None:
+            self.expanded += planned[1]
+            return list(planned[0])
+        ignore_idx = ignore[0] * self.height + ignore[1] if ignore is not None else -1
+        return self.search(start, end, self._carry_goal if carrying else self._goal, self._robots, ignore_idx)
+
+    def drop_charger_goals(self):
+        # Las rutas dejan de terminar en cualquier celda junto a un cargador: sin caja solo vale llegar al destino y
+        # con caja, junto a un estante. Lo usa el gestor de cargadores, que lleva a cada robot a su celda de carga.
+        self._goal = [False] * (self.width * self.height)
+        self._carry_goal = self.shelf_goal.ravel().tolist()
+
+    def exact_route(self, start, end):
+        # Ruta que termina justo en end, sin las capas de destino. Si los robots la cortan, la del mapa estático:
+        # los choques por el camino se resuelven en advance(), como en cualquier otra ruta
+        self.searches += 1
+        route = self.search(start, end, None, self._robots)
+        if route == [-1]:
+            self.searches += 1
+            route = self.search(start, end)
+        return route
+
+    def route(self, start, end, carrying=False, ignore=None):
+        # Con caché las rutas salen de ella (y se reparan si hay robots en medio); sin ella, A* completo
+        if self.cache is None:
+            return self.shortest_path(start, end, carrying, ignore)
+        return self.cache.route(self, start, end, carrying, ignore)
+
+    def search(self, start, end, goal=None, robots=None, ignore_idx=-1, limit=None):
+        # goal None: solo vale llegar a end; robots None: solo obstáculos estáticos; limit: máximo de nodos a expandir
+        width, height = self.width, self.height
+        blocked = self._blocked
+        end_x, end_y = end
+
+        # Igual que la implementación original, un nodo entra una sola vez en el heap mientras está
+        # abierto y conserva la prioridad con la que entró; in_open sustituye la búsqueda lineal.
+        open_set = [(0, start)]
+        in_open = {start}
+        came_from = {start: None}
+        g_score = {start: 0}
+        expanded = 0
+
+        while open_set:
+            current = heappop(open_set)[1]
+            in_open.discard(current)
+
+            x, y = current
+            if current == end or (goal is not None and goal[x * height + y]):
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = came_from[current]
+                path.reverse()
+                self.expanded += expanded
+                return path
+
+            expanded += 1
+            if limit is not None and expanded > limit:
+                break
+
+            tentative_g_score = g_score[current] + 1
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    idx = nx * height + ny
+                    if blocked[idx] or (robots is not None and robots[idx] - (idx == ignore_idx) > 0):
+                        continue
+
+                    neighbor = (nx, ny)
+                    if tentative_g_score < g_score.get(neighbor, float('inf')):
+                        came_from[neighbor] = current
+                        g_score[neighbor] = tentative_g_score
+                        if neighbor not in in_open:
+                            in_open.add(neighbor)
+                            heappush(open_set, (tentative_g_score + abs(nx - end_x) + abs(ny - end_y), neighbor))
+
+        self.expanded += expanded
+        return [-1]
+
+
+# Caché LRU de rutas sobre el mapa estático (que no cambia en toda la corrida),
+# con clave (inicio, destino, si lleva caja). Una ruta cacheada se comprueba contra los robots del
+# paso actual; si alguno la bloquea se busca un desvío local alrededor del tramo
+# bloqueado y solo si no lo hay se recalcula la ruta completa con A*.
+class RouteCache:
+    def __init__(self, max_routes=4096, repair_limit=256):
+        self.max_routes = max_routes
+        self.repair_limit = repair_limit
+        self.routes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.repairs = 0
+        self.fallbacks = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def stats(self):
+        return {"routes": len(self.routes), "hits": self.hits, "misses": self.misses, "repairs": self.repairs,
+                "fallbacks": self.fallbacks}
+
+    def clear(self):
+        self.routes.clear()
+
+    def route(self, pathfinder, start, end, carrying=False, ignore=None):
+        key = (start, end, carrying)
+        route = self.routes.get(key)
+        if route is None:
+            self.misses += 1
+            pathfinder.searches += 1
+            route = tuple(pathfinder.search(start, end, pathfinder._carry_goal if carrying else pathfinder._goal))
+            self.routes[key] = route
+            if len(self.routes) > self.max_routes:
+                self.routes.popitem(last=False)
+        else:
+            self.hits += 1
+            self.routes.move_to_end(key)
+
+        if route == (-1,):
+            return [-1]
+
+        goal = pathfinder._carry_goal if carrying else pathfinder._goal
+        repaired = self.repair(pathfinder, list(route), goal, ignore)
+        if repaired is None:
+            self.fallbacks += 1
+            return pathfinder.shortest_path(start, end, carrying, ignore)
+        return repaired
+
+    def repair(self, pathfinder, route, goal, ignore=None):
+        height = pathfinder.height
+        robots = pathfinder._robots
+        ignore_idx = ignore[0] * height + ignore[1] if ignore is not None else -1
+
+        def occupied(pos):
+            idx = pos[0] * height + pos[1]
+            return robots[idx] - (idx == ignore_idx) > 0
+
+        i = 1
+        while i < len(route):
+            if not occupied(route[i]):
+                i += 1
+                continue
+
+            # Tramo bloqueado route[i:j]; se une route[i - 1] con route[j] esquivando robots
+            # (si el bloqueo llega al final, el desvío puede terminar en cualquier otra celda objetivo)
+            j = i + 1
+            while j < len(route) and occupied(route[j]):
+                j += 1
+
+            if j < len(route):
+                detour = pathfinder.search(route[i - 1], route[j], None, robots, ignore_idx, self.repair_limit)
+            else:
+                detour = pathfinder.search(route[i - 1], route[-1], goal, robots, ignore_idx, self.repair_limit)
+            if detour == [-1]:
+                return None
+
+            self.repairs += 1
+            route[i - 1:j + 1] = detour
+            i += len(detour) - 1
+        return route
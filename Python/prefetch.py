@@ -0,0 +1,165 @@
+import threading
+import time
+
+import wire
+from simulations import SimulationNotFound
+
+
+def advance(model, steps, state=True, frame=True):
+    # (paso, estado, fotograma) de los steps pasos siguientes del modelo, con su candado: primero los ya ejecutados
+    # de model.prefetched y después pasos nuevos (de estos solo se calcula lo pedido). Todo lo que avanza una
+    # simulación del servicio pasa por aquí, así que los pasos siempre se entregan en orden.
+    for _ in range(steps):
+        if model.prefetched:
+            yield model.prefetched.popleft()
+        else:
+            model.step()
+            yield (model.steps, model.collect_detailed_data() if state else None,
+                   wire.pack_frame(model) if frame else None)
+
+
+def fast_forward(model, steps, sample_every=None, binary=False):
+    # Lo mismo que model.fast_forward (con wire.pack_frame si binary), empezando por los pasos ya ejecutados
+    buffered = list(advance(model, min(steps, len(model.prefetched))))
+    samples = [(step, frame if binary else state) for done, (step, state, frame) in enumerate(buffered, 1)
+               if done == steps or (sample_every and done % sample_every == 0)]
+
+    collect = wire.pack_frame if binary else None
+    rest = steps - len(buffered)
+    if rest and sample_every and len(buffered) % sample_every:
+        # Hasta la siguiente muestra (o el final), para que las muestras caigan donde sin el buffer
+        gap = min(rest, sample_every - len(buffered) % sample_every)
+        samples += model.fast_forward(gap, 0, collect)
+        rest -= gap
+    if rest:
+        samples += model.fast_forward(rest, sample_every, collect)
+    return samples
+
+
+# Pasos calculados por adelantado de una simulación. Un hilo avanza el modelo (con
+# el candado de la simulación) y deja cada paso en model.prefetched, hasta tener
+# tantos como pidió el cliente la última vez (como mucho max_frames). take()
+# entrega primero esos pasos y calcula en el momento solo los que falten, así que
+# un cliente que pide lotes seguidos recibe su lote sin esperar y el hilo no se
+# adelanta más que un lote. El resto de endpoints que avanzan la simulación
+# (delta, sample_every, el feed) también empiezan por los pasos pendientes, y los
+# snapshots los guardan. Sin peticiones durante idle segundos el hilo se para
+# (los pasos pendientes se conservan) y la siguiente petición lo vuelve a arrancar.
+# Ojo: el modelo va por delante de lo entregado. model.steps, los contadores, el
+# perfil y todo lo que se lea directamente del modelo (como /metrics) incluyen los
+# len(model.prefetched) pasos pendientes; /metrics devuelve también delivered_step,
+# el último paso que ha recibido algún cliente.
+class Prefetcher:
+    def __init__(self, manager, simulation_id, max_frames=64, idle=30, on_stop=None):
+        self.manager = manager
+        self.simulation_id = simulation_id
+        self.max_frames = max_frames
+        self.idle = idle
+        self.on_stop = on_stop
+        self.depth = 1
+        # Pasos pendientes en el modelo la última vez que se miró (con su candado)
+        self.buffered = 0
+        self.last_request = time.monotonic()
+        self.condition = threading.Condition()
+        self.thread = None
+        # Pasos servidos desde el buffer y calculados durante la petición
+        self.prefetched = 0
+        self.computed = 0
+
+    def start(self):
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, daemon=True)
+                self.thread.start()
+
+    def take(self, model, steps, binary=False):
+        # Con el candado de la simulación: [(paso, estado, fotograma)] de los steps pasos siguientes; de los que no
+        # estaban calculados solo el fotograma (binary) o solo el estado
+        available = min(steps, len(model.prefetched))
+        frames = list(advance(model, steps, state=not binary, frame=binary))
+        with self.condition:
+            self.depth = min(max(steps, 1), self.max_frames)
+            self.buffered = len(model.prefetched)
+            self.last_request = time.monotonic()
+            self.prefetched += available
+            self.computed += steps - available
+            self.condition.notify()
+        return frames
+
+    def wait(self):
+        # Espera a que haga falta otro paso; False si pasan idle segundos sin peticiones
+        with self.condition:
+            while self.buffered >= self.depth:
+                remaining = self.idle - (time.monotonic() - self.last_request)
+                if remaining <= 0:
+                    self.thread = None
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def step(self):
+        with self.manager.locked(self.simulation_id) as model:
+            if len(model.prefetched) < self.depth:
+                model.step()
+                model.prefetched.append((model.steps, model.collect_detailed_data(), wire.pack_frame(model)))
+            with self.condition:
+                self.buffered = len(model.prefetched)
+
+    def loop(self):
+        # Si la simulación desaparece (o se expulsó sin snapshot mientras el hilo estaba parado) se descarta
+        try:
+            while self.wait():
+                self.step()
+                # Cede el GIL entre pasos para que las peticiones en curso no esperen a que se llene el buffer
+                time.sleep(0)
+            if self.simulation_id in self.manager:
+                return
+        except SimulationNotFound:
+            with self.condition:
+                self.thread = None
+        if self.on_stop is not None:
+            self.on_stop(self)
+
+
+# Hilos de precálculo por simulación para GET /warehouseSimulations/<id>?steps=N
+# (WAREHOUSE_PREFETCH_FRAMES en Flask.py).
+class PrefetchManager:
+    def __init__(self, manager, max_frames=64, idle=30):
+        if max_frames < 1:
+            raise ValueError("max_frames must be at least 1")
+
+        self.manager = manager
+        self.max_frames = max_frames
+        self.idle = idle
+        self.prefetchers = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.prefetchers)
+
+    def prefetcher(self, simulation_id):
+        with self.lock:
+            prefetcher = self.prefetchers.get(simulation_id)
+            if prefetcher is None:
+                prefetcher = Prefetcher(self.manager, simulation_id, self.max_frames, self.idle,
+                                        on_stop=self._stopped)
+                self.prefetchers[simulation_id] = prefetcher
+            return prefetcher
+
+    def _stopped(self, prefetcher):
+        with self.lock:
+            if self.prefetchers.get(prefetcher.simulation_id) is prefetcher:
+                del self.prefetchers[prefetcher.simulation_id]
+
+    def run(self, simulation_id, steps, binary=False):
+        # Lo mismo que run_steps (o run_frames con binary) pero con los pasos del buffer
+        prefetcher = self.prefetcher(simulation_id)
+        try:
+            frames = self.manager.run(simulation_id, prefetcher.take, steps, binary)
+        except SimulationNotFound:
+            self._stopped(prefetcher)
+            raise
+        prefetcher.start()
+        if binary:
+            return wire.encode(frame for _, _, frame in frames)
+        return [state for _, state, _ in frames]
@@ -0,0 +1,66 @@
+import time
+from collections import deque
+
+PHASES = ["collect", "robots_step", "robots_advance", "belts_step", "dispatch"]
+COUNTERS = ["path_searches", "nodes_expanded", "neighbour_queries", "robot_searches", "route_cache_hits",
+            "route_cache_misses", "route_cache_repairs", "route_cache_fallbacks"]
+
+
+# Medición por fases de step(). Desactivado solo cuesta una comprobación por paso;
+# activado guarda el tiempo de cada fase y cuánto subieron los contadores del
+# modelo (model.counters()) en cada paso, en un historial de history pasos, y
+# acumula los totales desde el último reset().
+class StepProfiler:
+    def __init__(self, history=1024):
+        self.enabled = False
+        self.history = deque(maxlen=history)
+        self.reset()
+
+    def reset(self):
+        self.steps = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.history.clear()
+        self._current = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def begin(self, model):
+        self._current = {"seconds": {}, "counts": model.counters()}
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        # Tiempo transcurrido desde la marca anterior, asignado a phase
+        now = time.perf_counter()
+        self._current["seconds"][phase] = self._current["seconds"].get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def end(self, model, phase):
+        self.mark(phase)
+        record = self._current
+        before = record["counts"]
+        record["counts"] = {name: value - before[name] for name, value in model.counters().items()}
+
+        self.steps += 1
+        for name, value in record["seconds"].items():
+            self.seconds[name] += value
+        for name, value in record["counts"].items():
+            self.counts[name] += value
+        self.history.append(record)
+        self._current = None
+
+    def summary(self):
+        steps = self.steps or 1
+        return {
+            "enabled": self.enabled,
+            "steps": self.steps,
+            "seconds": dict(self.seconds),
+            "counts": dict(self.counts),
+            "seconds_per_step": {name: value / steps for name, value in self.seconds.items()},
+            "counts_per_step": {name: value / steps for name, value in self.counts.items()},
+            "last_step": self.history[-1] if self.history else None
+        }
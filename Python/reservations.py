@@ -0,0 +1,235 @@
+from heapq import heappush, heappop
+
+import numpy as np
+
+# Movimientos en el espacio-tiempo: quedarse quieto o ir a una vecina (Von Neumann)
+MOVES = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+NEIGHBOURS = MOVES[1:]
+
+
+# Tabla de reservas (celda, paso) compartida por todos los robots. Cada robot
+# reserva las celdas de su ruta en el paso en que las ocupará y, desde que llega
+# al final, la última celda sin límite de tiempo (aparcado). Un robot sin ruta
+# está aparcado en su celda. Las rutas se buscan con A* en el espacio-tiempo
+# (A* cooperativo: cada robot planifica respetando las reservas de los demás),
+# así que no hay dos robots en la misma celda en el mismo paso ni cruzándose.
+# Si un robot sin destino está aparcado donde otro tiene que llegar o en el camino
+# de una búsqueda que falla, se le pide que se aparte (requested); el que no
+# encuentra ruta lo vuelve a intentar pasados backoff pasos, el doble tras cada
+# fallo seguido (hasta max_backoff).
+class ReservationTable:
+    def __init__(self, pathfinder, max_expanded=2000, max_wait=32, backoff=2, max_backoff=64):
+        self.pathfinder = pathfinder
+        self.max_expanded = max_expanded
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cells = {}
+        self.parked = {}
+        self.owned = {}
+        self.requested = set()
+        self.retry_at = {}
+        self.failed = {}
+        self.failures = 0
+        # Robots aparcados con los que chocó la última búsqueda
+        self.blockers = set()
+
+    def park(self, robot, pos, since):
+        self.parked[pos] = (robot, since)
+        self.owned.setdefault(robot, []).append((pos, None))
+
+    def reserve(self, robot, route, start_time, park=True):
+        cells = self.owned.setdefault(robot, [])
+        for step, pos in enumerate(route):
+            self.cells.setdefault(pos, {})[start_time + step] = robot
+            cells.append((pos, start_time + step))
+        if park:
+            self.park(robot, route[-1], start_time + len(route) - 1)
+
+    def release(self, robot):
+        for pos, time in self.owned.pop(robot, ()):
+            if time is None:
+                if self.parked.get(pos, (None,))[0] is robot:
+                    del self.parked[pos]
+            else:
+                times = self.cells.get(pos)
+                if times is not None and times.get(time) is robot:
+                    del times[time]
+                    if not times:
+                        del self.cells[pos]
+
+    def arrays(self):
+        # Estado de la tabla para los snapshots, con los robots por unique_id
+        cells = [(pos[0], pos[1], time, robot.unique_id) for pos, times in self.cells.items()
+                 for time, robot in times.items()]
+        parked = [(pos[0], pos[1], since, robot.unique_id) for pos, (robot, since) in self.parked.items()]
+        retry = [(robot.unique_id, time, self.failed.get(robot, 0)) for robot, time in self.retry_at.items()]
+        return {
+            "reserved_cells": np.array(cells, dtype=np.int64).reshape(-1, 4),
+            "reserved_parked": np.array(parked, dtype=np.int64).reshape(-1, 4),
+            "reserved_requested": np.array([robot.unique_id for robot in self.requested], dtype=np.int64),
+            "reserved_retry": np.array(retry, dtype=np.int64).reshape(-1, 3)
+        }
+
+    def restore(self, arrays, robots, failures=0):
+        # robots: unique_id -> robot
+        self.cells, self.parked, self.owned = {}, {}, {}
+        for x, y, time, unique_id in arrays["reserved_cells"].tolist():
+            self.cells.setdefault((x, y), {})[time] = robots[unique_id]
+            self.owned.setdefault(robots[unique_id], []).append(((x, y), time))
+        for x, y, since, unique_id in arrays["reserved_parked"].tolist():
+            self.park(robots[unique_id], (x, y), since)
+        self.requested = {robots[unique_id] for unique_id in arrays["reserved_requested"].tolist()}
+        self.retry_at = {robots[unique_id]: time for unique_id, time, _ in arrays["reserved_retry"].tolist()}
+        self.failed = {robots[unique_id]: failed for unique_id, _, failed in arrays["reserved_retry"].tolist()
+                       if failed}
+        self.failures = failures
+
+    def owner(self, pos, time):
+        robot = self.cells.get(pos, {}).get(time)
+        if robot is None:
+            parked = self.parked.get(pos)
+            if parked is not None and parked[1] <= time:
+                robot = parked[0]
+        return robot
+
+    def free_from(self, robot, pos, time):
+        # Nadie más usa la celda desde time en adelante (para poder aparcar en ella)
+        parked = self.parked.get(pos)
+        if parked is not None and parked[0] is not robot:
+            return False
+        return all(other is robot or step < time for step, other in self.cells.get(pos, {}).items())
+
+    def goal_cells(self, end):
+        # El destino o, si es un estante o un cargador, sus vecinas libres
+        height = self.pathfinder.height
+        blocked = self.pathfinder._blocked
+        if not blocked[end[0] * height + end[1]]:
+            return [end]
+        return [(end[0] + dx, end[1] + dy) for dx, dy in NEIGHBOURS
+                if 0 <= end[0] + dx < self.pathfinder.width and 0 <= end[1] + dy < height and
+                not blocked[(end[0] + dx) * height + end[1] + dy]]
+
+    def plan(self, robot, start, start_time, now, end):
+        # Ruta con route[k] ocupada en start_time + k; el robot espera en start desde now hasta start_time.
+        # Si no hay ruta, el robot queda aparcado en start y se devuelve [-1].
+        if self.retry_at.get(robot, now) > now:
+            return [-1]
+
+        self.release(robot)
+        goals = self.goal_cells(end)
+        blockers = [self.parked[pos][0] for pos in goals if pos in self.parked and self.parked[pos][0] is not robot]
+        self.blockers = set()
+        route = None if len(blockers) == len(goals) else self.search(robot, start, start_time, now, end)
+        if route is None:
+            self.failures += 1
+            self.park(robot, start, now)
+            self.failed[robot] = self.failed.get(robot, 0) + 1
+            self.retry_at[robot] = now + min(self.backoff << (self.failed[robot] - 1), self.max_backoff)
+            self.requested.update(blocker for blocker in blockers + list(self.blockers) if blocker.destination is None)
+            return [-1]
+
+        self.retry_at.pop(robot, None)
+        self.failed.pop(robot, None)
+        self.reserve(robot, [start] * (start_time - now), now, park=False)
+        self.reserve(robot, route, start_time)
+        return route
+
+    def move_away(self, robot, start, start_time, now, avoid=()):
+        # Lleva a un robot parado a la celda libre más cercana (BFS) que no esté en avoid, prefiriendo las que
+        # no están junto a un estante o un cargador (donde otros tienen que llegar)
+        self.requested.discard(robot)
+        pathfinder = self.pathfinder
+        width, height = pathfinder.width, pathfinder.height
+        blocked = pathfinder._blocked
+        seen = {start}
+        frontier = [start]
+        candidates = []
+        for _ in range(self.max_wait):
+            following = []
+            for x, y in frontier:
+                for dx, dy in NEIGHBOURS:
+                    cell = (x + dx, y + dy)
+                    if cell in seen or not (0 <= cell[0] < width and 0 <= cell[1] < height) or \
+                            blocked[cell[0] * height + cell[1]]:
+                        continue
+                    seen.add(cell)
+                    following.append(cell)
+                    if cell not in avoid and self.free_from(robot, cell, now):
+                        candidates.append(cell)
+            frontier = following
+
+        candidates.sort(key=lambda cell: pathfinder._carry_goal[cell[0] * height + cell[1]])
+        for cell in candidates[:8]:
+            route = self.search(robot, start, start_time, now, cell)
+            if route is not None:
+                self.release(robot)
+                self.reserve(robot, [start] * (start_time - now), now, park=False)
+                self.reserve(robot, route, start_time)
+                return route
+        return [-1]
+
+    def search(self, robot, start, start_time, now, end):
+        pathfinder = self.pathfinder
+        width, height = pathfinder.width, pathfinder.height
+        blocked = pathfinder._blocked
+        end_x, end_y = end
+        # A diferencia del A* original, la ruta termina en el destino o, si es un estante o un cargador, junto
+        # a él (no junto a cualquiera), para que el robot pueda dejar la caja donde se le asignó
+        end_blocked = blocked[end_x * height + end_y]
+
+        # El robot tiene que poder quedarse en start hasta start_time
+        for time in range(now, start_time + 1):
+            if self.owner(start, time) not in (None, robot):
+                return None
+
+        horizon = start_time + abs(start[0] - end_x) + abs(start[1] - end_y) + self.max_wait
+        open_set = [(abs(start[0] - end_x) + abs(start[1] - end_y), 0, start)]
+        came_from = {(start, 0): None}
+        expanded = 0
+
+        while open_set:
+            _, g, current = heappop(open_set)
+            x, y = current
+            time = start_time + g
+
+            at_goal = (abs(x - end_x) + abs(y - end_y) == 1) if end_blocked else current == end
+            if at_goal and self.free_from(robot, current, time):
+                path = []
+                node = (current, g)
+                while node is not None:
+                    path.append(node[0])
+                    node = came_from[node]
+                path.reverse()
+                return path
+
+            expanded += 1
+            if expanded > self.max_expanded:
+                break
+            if time >= horizon:
+                continue
+
+            for dx, dy in MOVES:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height) or blocked[nx * height + ny]:
+                    continue
+
+                neighbor = (nx, ny)
+                node = (neighbor, g + 1)
+                if node in came_from:
+                    continue
+                owner = self.owner(neighbor, time + 1)
+                if owner is not None and owner is not robot:
+                    if self.parked.get(neighbor, (None,))[0] is owner:
+                        self.blockers.add(owner)
+                    continue
+
+                # Dos robots no pueden intercambiarse las celdas en el mismo paso
+                other = self.owner(neighbor, time)
+                if other is not None and other is not robot and self.owner(current, time + 1) is other:
+                    continue
+
+                came_from[node] = (current, g)
+                heappush(open_set, (g + 1 + abs(nx - end_x) + abs(ny - end_y), g + 1, neighbor))
+
+        return None
@@ -0,0 +1,109 @@
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+from mesa.agent import Agent
+from mesa.time import SimultaneousActivation
+
+
+# Activación simultánea (todos los step() y después todos los advance(), en el
+# orden en que se añadieron los agentes) que solo llama a los agentes despiertos.
+# Los agentes sin step ni advance propios (estantes, cargadores) nunca se
+# despiertan. Al final de cada paso se duermen los que dicen estar inactivos
+# (idle()) y solo se despiertan con wake(), que los pone en una cola por paso: en
+# el paso indicado o, si se llama durante una fase, en esa misma fase si todavía
+# no les ha tocado. Con cells, los dormidos se guardan por celda y touch(pos)
+# despierta a los de una celda: antes de la fase de advance se tocan las celdas a
+# las que van los despiertos (next_pos), para los que se apartan en advance(). Un
+# agente inactivo despierto no hace nada, así que despertar de más nunca cambia el
+# resultado.
+class EventActivation(SimultaneousActivation):
+    def __init__(self, model, cells=False):
+        super().__init__(model)
+        self.cells = cells
+        self.order = {}
+        self.awake = set()
+        self.sleeping = {}
+        self.queue = []
+        self.counter = count()
+        self.phase = None
+        self.cursor = -1
+        # Llamadas a step/advance hechas y ahorradas
+        self.activations = 0
+        self.skipped = 0
+
+    def add(self, agent):
+        super().add(agent)
+        self.order[agent] = len(self.order)
+        if type(agent).step is not Agent.step or type(agent).advance is not Agent.advance:
+            self.awake.add(agent)
+
+    def remove(self, agent):
+        super().remove(agent)
+        self.awake.discard(agent)
+        self.unpark(agent)
+
+    def unpark(self, agent):
+        sleeping = self.sleeping.get(agent.pos)
+        if sleeping is not None and agent in sleeping:
+            sleeping.discard(agent)
+            if not sleeping:
+                del self.sleeping[agent.pos]
+
+    def activate(self, agent):
+        self.awake.add(agent)
+        if self.cells:
+            self.unpark(agent)
+
+    def wake(self, agent, time=None):
+        if agent in self.awake or agent not in self.order:
+            return
+        if self.phase is not None:
+            self.activate(agent)
+            if self.order[agent] > self.cursor:
+                heappush(self.phase, (self.order[agent], agent))
+        else:
+            heappush(self.queue, (self.steps if time is None else time, next(self.counter), agent))
+
+    def touch(self, pos):
+        sleeping = self.sleeping.get(pos)
+        if sleeping:
+            for agent in sorted(sleeping, key=self.order.get):
+                self.wake(agent)
+
+    def begin(self):
+        while self.queue and self.queue[0][0] <= self.steps:
+            agent = heappop(self.queue)[2]
+            if agent not in self.awake and agent in self.order:
+                self.activate(agent)
+
+    def run(self, method):
+        if method == "advance" and self.cells and self.sleeping:
+            for agent in list(self.awake):
+                for sleeper in list(self.sleeping.get(agent.next_pos, ())):
+                    self.activate(sleeper)
+
+        self.phase = [(self.order[agent], agent) for agent in self.awake]
+        heapify(self.phase)
+        self.activations += len(self.phase)
+        self.skipped += len(self.order) - len(self.phase)
+        while self.phase:
+            self.cursor, agent = heappop(self.phase)
+            getattr(agent, method)()
+        self.phase = None
+        self.cursor = -1
+
+    def finish(self):
+        for agent in list(self.awake):
+            idle = getattr(agent, "idle", None)
+            if idle is not None and idle():
+                self.awake.discard(agent)
+                if self.cells:
+                    self.sleeping.setdefault(agent.pos, set()).add(agent)
+        self.steps += 1
+        self.time += 1
+
+    def step(self):
+        self.begin()
+        self.run("step")
+        self.run("advance")
+        self.finish()
@@ -1,5 +1,6 @@
 import mesa
 from model import Warehouse, Robot, Charger, ConveyorBelt, Shelf, Box, Cell
+from layout import Layout
 
 MAX_NUMBER_ROBOTS = 20
 
@@ -66,8 +67,10 @@ def agent_portrayal(agent):
         }
 
 
+layout = Layout.default()
+
 grid = mesa.visualization.CanvasGrid(
-    agent_portrayal, 14, 13, 400, 400)
+    agent_portrayal, layout.width, layout.height, 400, 400)
     
 model_params = {
     "num_robots": mesa.visualization.Slider(
@@ -0,0 +1,130 @@
+from bisect import bisect_left, insort
+
+
+# Índice de los estantes libres por fila. Cada fila guarda cuántos huecos libres
+# le quedan y, si es recta (horizontal o vertical), sus huecos libres ordenados
+# por la coordenada que varía, así que el hueco libre más cercano a una posición
+# se encuentra con una búsqueda binaria. Para cada posición desde la que se
+# pregunta se guardan las filas ordenadas por distancia a su primer estante y un
+# cursor que salta las filas llenas. Los resultados (y los empates) son los del
+# recorrido original: la fila más cercana con algún hueco libre y, en ella, el
+# hueco libre más cercano, el primero de la fila si hay empate.
+# Se actualiza con store() al dejar una caja y con retrieve() al sacarla.
+class ShelfIndex:
+    def __init__(self, rows, shelves, distance=None):
+        # rows: filas de posiciones del layout; shelves: los agentes Shelf en ese mismo orden;
+        # distance(a, b): distancia para ordenar las filas (None si no hay ruta); por defecto, Manhattan
+        self.rows = rows
+        self.distance = distance
+        self.at = {}
+        self.row_of = {}
+        self.axis = []
+        self.free = []
+        self.free_count = []
+        self.row_order = {}
+        self.cursor = {}
+        self.queries = 0
+        # Huecos liberados con retrieve(); quien guarde cursores propios (Dispatcher) los reinicia si cambia
+        self.retrievals = 0
+
+        shelves = iter(shelves)
+        for row_index, row in enumerate(rows):
+            if len({y for _, y in row}) == 1:
+                axis = 0
+            elif len({x for x, _ in row}) == 1:
+                axis = 1
+            else:
+                axis = None
+            self.axis.append(axis)
+            self.free.append([])
+            self.free_count.append(0)
+            for i, pos in enumerate(row):
+                shelf = next(shelves)
+                self.at[pos] = shelf
+                self.row_of[pos] = (row_index, i)
+                if shelf.limit > 0 and shelf.stored_box is None:
+                    self._add(pos)
+
+    def __len__(self):
+        return sum(self.free_count)
+
+    def is_free(self, pos):
+        shelf = self.at.get(pos)
+        return shelf is not None and shelf.limit > 0 and shelf.stored_box is None
+
+    def _key(self, pos):
+        row_index, i = self.row_of[pos]
+        axis = self.axis[row_index]
+        return (pos[axis], i) if axis is not None else (i,)
+
+    def _add(self, pos):
+        row_index = self.row_of[pos][0]
+        insort(self.free[row_index], self._key(pos))
+        self.free_count[row_index] += 1
+
+    def _remove(self, pos):
+        row_index = self.row_of[pos][0]
+        free = self.free[row_index]
+        key = self._key(pos)
+        index = bisect_left(free, key)
+        if index < len(free) and free[index] == key:
+            free.pop(index)
+            self.free_count[row_index] -= 1
+
+    def store(self, shelf, box):
+        shelf.stored_box = box
+        self._remove(shelf.pos)
+
+    def retrieve(self, shelf):
+        box = shelf.stored_box
+        shelf.stored_box = None
+        if box is not None and shelf.limit > 0:
+            self._add(shelf.pos)
+            self.retrievals += 1
+            # Una fila puede volver a tener huecos: los cursores empiezan de nuevo
+            for pos in self.cursor:
+                self.cursor[pos] = 0
+        return box
+
+    def nearest_row(self, pos):
+        # Índice de la fila más cercana (distancia a su primer estante) con algún hueco libre, o None
+        order = self.row_order.get(pos)
+        if order is None:
+            order = sorted(range(len(self.rows)), key=lambda i: (self.row_distance(pos, i), i))
+            self.row_order[pos] = order
+            self.cursor[pos] = 0
+
+        cursor = self.cursor[pos]
+        while cursor < len(order) and not self.free_count[order[cursor]]:
+            cursor += 1
+        self.cursor[pos] = cursor
+        return order[cursor] if cursor < len(order) else None
+
+    def row_distance(self, pos, row_index):
+        first = self.rows[row_index][0]
+        if self.distance is None:
+            return abs(pos[0] - first[0]) + abs(pos[1] - first[1])
+        distance = self.distance(pos, first)
+        return distance if distance is not None else float('inf')
+
+    def nearest_in_row(self, row_index, pos):
+        # Hueco libre de la fila más cercano a pos (el primero de la fila si hay empate), o None
+        free = self.free[row_index]
+        if not free:
+            return None
+        row = self.rows[row_index]
+        axis = self.axis[row_index]
+        if axis is None:
+            return min((row[key[0]] for key in free),
+                       key=lambda slot: (abs(pos[0] - slot[0]) + abs(pos[1] - slot[1]), self.row_of[slot][1]))
+
+        index = bisect_left(free, (pos[axis],))
+        candidates = [row[i] for _, i in free[max(index - 1, 0):index + 1]]
+        return min(candidates, key=lambda slot: (abs(pos[axis] - slot[axis]), self.row_of[slot][1]))
+
+    def nearest_free(self, pos):
+        self.queries += 1
+        row_index = self.nearest_row(pos)
+        if row_index is None:
+            return None
+        return self.nearest_in_row(row_index, pos)
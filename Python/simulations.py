@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Estimación aproximada de lo que ocupa cada agente de Mesa (celdas incluidas), cada entrada de un estado de
+# collect_detailed_data() y cada ruta de la caché de rutas (más cada una de sus celdas)
+AGENT_BYTES = 1500
+STATE_ENTRY_BYTES = 300
+ROUTE_BYTES = 200
+ROUTE_CELL_BYTES = 64
+
+
+def estimate_memory(model):
+    collector = model.datacollector
+    chunks = collector.chunks + [collector.current]
+    collected = sum(chunk.robots.nbytes + chunk.shelves.nbytes + chunk.boxes.nbytes for chunk in chunks)
+    memory = model.grid.width * model.grid.height * AGENT_BYTES + len(model.schedule.agents) * AGENT_BYTES + collected
+
+    # Pasos ya calculados por adelantado (prefetch.py): estado y fotograma de cada uno
+    for _, state, frame in model.prefetched:
+        if state is not None:
+            memory += sum(len(entries) for entries in state.values()) * STATE_ENTRY_BYTES
+        if frame is not None:
+            memory += len(frame)
+
+    cache = model.pathfinder.cache
+    if cache is not None:
+        memory += len(cache.routes) * ROUTE_BYTES + sum(len(route) for route in cache.routes.values()) * \
+            ROUTE_CELL_BYTES
+    if model.fields is not None:
+        memory += model.fields.nbytes()
+    return memory
+
+
+def is_simulation_id(simulation_id):
+    # Los ids también forman el nombre del snapshot, así que solo se aceptan UUIDs
+    try:
+        return str(uuid.UUID(simulation_id)) == simulation_id
+    except ValueError:
+        return False
+
+
+class SimulationNotFound(KeyError):
+    pass
+
+
+class Simulation:
+    def __init__(self, simulation_id, model):
+        self.id = simulation_id
+        self.model = model
+        self.lock = threading.Lock()
+        self.last_access = time.monotonic()
+        self.memory = estimate_memory(model)
+        self.checkpoint_step = model.steps
+
+
+# Guarda los almacenes por id con un candado por simulación. Las simulaciones que
+# llevan más de ttl segundos sin usarse, o las menos usadas cuando se supera
+# max_simulations o max_memory, se expulsan (y se guardan en snapshot_dir si se
+# indica, para restaurarlas en el siguiente acceso). Los snapshots se escriben con
+# model.save() y se leen con load (p. ej. Warehouse.load); con checkpoint_steps
+# además se guarda un snapshot cada tantos pasos, así que sobreviven a un reinicio
+# del servicio. El snapshot de una simulación expulsada se escribe fuera del
+# candado del gestor (el resto de peticiones siguen) y con el de la simulación; si
+# se vuelve a pedir mientras tanto, se recupera la misma simulación en memoria.
+# Restaurar un snapshot también se hace fuera del candado del gestor: la primera
+# petición lo carga y las demás de esa simulación esperan a que termine.
+class SimulationManager:
+    def __init__(self, max_simulations=64, ttl=30 * 60, max_memory=None, snapshot_dir=None, load=None,
+                 checkpoint_steps=None):
+        if snapshot_dir is not None and load is None:
+            raise ValueError("snapshot_dir needs a load function to restore the snapshots")
+
+        self.max_simulations = max_simulations
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.snapshot_dir = snapshot_dir
+        self.load = load
+        self.checkpoint_steps = checkpoint_steps
+        self.simulations = OrderedDict()
+        # Simulaciones expulsadas cuyo snapshot se está escribiendo
+        self.saving = {}
+        # Simulaciones cuyo snapshot se está cargando: id -> Event que se activa al terminar
+        self.restoring = {}
+        self.lock = threading.Lock()
+
+        if snapshot_dir is not None:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self.simulations)
+
+    def __contains__(self, simulation_id):
+        with self.lock:
+            return simulation_id in self.simulations or simulation_id in self.saving or \
+                simulation_id in self.restoring or self._has_snapshot(simulation_id)
+
+    def create(self, model):
+        simulation = Simulation(str(uuid.uuid4()), model)
+        with self.lock:
+            self.simulations[simulation.id] = simulation
+            evicted = self._evict(keep=simulation.id)
+        self._save_evicted(evicted)
+        return simulation.id
+
+    def get(self, simulation_id):
+        while True:
+            with self.lock:
+                simulation = self.simulations.get(simulation_id) or self.saving.get(simulation_id)
+                if simulation is not None:
+                    self.simulations[simulation_id] = simulation
+                    simulation.last_access = time.monotonic()
+                    self.simulations.move_to_end(simulation_id)
+                    evicted = self._evict(keep=simulation_id)
+                    break
+                restoring = self.restoring.get(simulation_id)
+                if restoring is None:
+                    if not self._has_snapshot(simulation_id):
+                        raise SimulationNotFound(simulation_id)
+                    restoring = self.restoring[simulation_id] = threading.Event()
+                    loading = True
+                else:
+                    loading = False
+
+            if loading:
+                self._restore(simulation_id, restoring)
+            else:
+                restoring.wait()
+        self._save_evicted(evicted)
+        return simulation
+
+    def remove(self, simulation_id):
+        with self.lock:
+            self.simulations.pop(simulation_id, None)
+            self.saving.pop(simulation_id, None)
+            self.restoring.pop(simulation_id, None)
+            if self._has_snapshot(simulation_id):
+                os.remove(self._snapshot_path(simulation_id))
+
+    @contextmanager
+    def locked(self, simulation_id):
+        while True:
+            simulation = self.get(simulation_id)
+            simulation.lock.acquire()
+            # Si se expulsó entre get() y acquire(), se vuelve a cargar
+            if self.simulations.get(simulation_id) is simulation:
+                break
+            simulation.lock.release()
+
+        try:
+            yield simulation.model
+            simulation.last_access = time.monotonic()
+            simulation.memory = estimate_memory(simulation.model)
+            if self.checkpoint_steps is not None and \
+                    simulation.model.steps - simulation.checkpoint_step >= self.checkpoint_steps:
+                self._save(simulation)
+        finally:
+            simulation.lock.release()
+
+    def checkpoint(self, simulation_id):
+        # Guarda ya un snapshot sin expulsar la simulación; devuelve la ruta del fichero
+        if self.snapshot_dir is None:
+            raise ValueError("Checkpoints need a snapshot_dir")
+        with self.locked(simulation_id):
+            return self._save(self.simulations[simulation_id])
+
+    def run(self, simulation_id, function, *args):
+        # function(model, *args) con la simulación bloqueada, en el hilo de la petición
+        with self.locked(simulation_id) as model:
+            return function(model, *args)
+
+    def total_memory(self):
+        return sum(simulation.memory for simulation in self.simulations.values())
+
+    def _evict(self, keep=None):
+        # Con self.lock; devuelve las expulsadas que hay que guardar con _save_evicted() al soltarlo
+        now = time.monotonic()
+        evicted = []
+        candidates = [simulation for simulation in self.simulations.values() if simulation.id != keep]
+        for simulation in candidates:
+            if now - simulation.last_access > self.ttl:
+                self._evict_one(simulation, evicted)
+
+        # Las menos usadas primero; las que están en uso no se expulsan
+        for simulation in candidates:
+            over_count = len(self.simulations) > self.max_simulations
+            over_memory = self.max_memory is not None and self.total_memory() > self.max_memory
+            if not (over_count or over_memory):
+                break
+            if simulation.id in self.simulations:
+                self._evict_one(simulation, evicted)
+        return evicted
+
+    def _evict_one(self, simulation, evicted):
+        # La simulación se queda bloqueada hasta que se escribe su snapshot
+        if not simulation.lock.acquire(blocking=False):
+            return
+        del self.simulations[simulation.id]
+        if self.snapshot_dir is not None:
+            self.saving[simulation.id] = simulation
+            evicted.append(simulation)
+        else:
+            simulation.lock.release()
+
+    def _save_evicted(self, evicted):
+        for simulation in evicted:
+            try:
+                self._save(simulation)
+            finally:
+                with self.lock:
+                    if self.saving.get(simulation.id) is simulation:
+                        del self.saving[simulation.id]
+                    elif simulation.id not in self.simulations and self._has_snapshot(simulation.id):
+                        # Se borró con remove() mientras se guardaba
+                        os.remove(self._snapshot_path(simulation.id))
+                simulation.lock.release()
+
+    def _save(self, simulation):
+        # Se escribe en un temporal y se renombra para no dejar nunca un snapshot a medias
+        path = self._snapshot_path(simulation.id)
+        with open(path + ".tmp", "wb") as file:
+            simulation.model.save(file)
+        os.replace(path + ".tmp", path)
+        simulation.checkpoint_step = simulation.model.steps
+        return path
+
+    def _restore(self, simulation_id, restoring):
+        # Sin self.lock. El snapshot se conserva como último checkpoint; remove() lo borra (si lo hace mientras se
+        # carga, la simulación no vuelve y la carga, haya fallado o no, acaba en SimulationNotFound)
+        model = None
+        try:
+            model = self.load(self._snapshot_path(simulation_id))
+        finally:
+            with self.lock:
+                removed = self.restoring.get(simulation_id) is not restoring
+                if not removed:
+                    del self.restoring[simulation_id]
+                    if model is not None:
+                        self.simulations[simulation_id] = Simulation(simulation_id, model)
+                restoring.set()
+            if removed:
+                raise SimulationNotFound(simulation_id)
+
+    def _snapshot_path(self, simulation_id):
+        return os.path.join(self.snapshot_dir, f"{simulation_id}.npz")
+
+    def _has_snapshot(self, simulation_id):
+        return self.snapshot_dir is not None and is_simulation_id(simulation_id) and \
+            os.path.exists(self._snapshot_path(simulation_id))
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+
+# Versión del formato; load() rechaza snapshots de otra versión
+FORMAT_VERSION = 1
+
+# Estado de next_pos y de una ruta que no son posiciones
+POSITION, NONE, INVALID = 0, 1, 2
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# Un snapshot es un .npz comprimido: una cabecera JSON (tipo, versión y escalares)
+# y arrays de numpy con el estado de robots, estantes, bandas y eventos.
+def write(file, kind, header, arrays):
+    header = {"kind": kind, "version": FORMAT_VERSION, **header}
+    np.savez_compressed(file, header=np.array(json.dumps(header)), **arrays)
+
+
+def read(file, kind):
+    with np.load(file) as data:
+        header = json.loads(str(data["header"]))
+        if header.get("kind") != kind:
+            raise SnapshotError(f"Snapshot of a {header.get('kind')}, expected a {kind}")
+        if header.get("version") != FORMAT_VERSION:
+            raise SnapshotError(f"Snapshot format version {header.get('version')} is not supported "
+                                f"(expected {FORMAT_VERSION})")
+        arrays = {key: data[key] for key in data.files if key != "header"}
+    return header, arrays
+
+
+def pack_positions(values):
+    # Lista de posiciones, None o -1 -> (estado, array (n, 2))
+    state = np.full(len(values), POSITION, dtype=np.int8)
+    positions = np.zeros((len(values), 2), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            state[i] = NONE
+        elif isinstance(value, tuple) and len(value) == 2:
+            positions[i] = value
+        else:
+            state[i] = INVALID
+    return state, positions
+
+
+def unpack_position(state, position):
+    if state == NONE:
+        return None
+    if state == INVALID:
+        return -1
+    return int(position[0]), int(position[1])
+
+
+def pack_routes(routes):
+    # Rutas (listas de posiciones o [-1]) -> celdas concatenadas, desplazamientos y marca de ruta fallida
+    offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+    failed = np.zeros(len(routes), dtype=bool)
+    cells = []
+    for i, route in enumerate(routes):
+        if route == [-1]:
+            failed[i] = True
+        else:
+            cells.extend(route)
+        offsets[i + 1] = len(cells)
+    return {"route_cells": np.array(cells, dtype=np.int32).reshape(-1, 2), "route_offsets": offsets,
+            "route_failed": failed}
+
+
+def unpack_routes(arrays):
+    cells = [tuple(cell) for cell in arrays["route_cells"].tolist()]
+    offsets = arrays["route_offsets"].tolist()
+    return [[-1] if failed else cells[offsets[i]:offsets[i + 1]]
+            for i, failed in enumerate(arrays["route_failed"].tolist())]
+
+
+def pack_rng(generator):
+    version, state, gauss_next = generator.getstate()
+    return {"rng_version": version, "rng_gauss_next": gauss_next}, np.array(state, dtype=np.uint32)
+
+
+def unpack_rng(generator, header, state):
+    generator.setstate((header["rng_version"], tuple(state.tolist()), header["rng_gauss_next"]))
@@ -0,0 +1,89 @@
+BUCKET_SIZE = 8
+
+
+# Índice espacial de los robots disponibles (batería > 25 y sin destino),
+# agrupados en cubetas de BUCKET_SIZE x BUCKET_SIZE celdas. Los robots se
+# actualizan con update() cada vez que cambian de posición, batería o destino.
+class RobotIndex:
+    def __init__(self, width, height, bucket_size=BUCKET_SIZE):
+        self.width = width
+        self.height = height
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        self.location = {}
+        self.queries = 0
+
+    @staticmethod
+    def is_available(robot):
+        return robot.battery > 25 and robot.destination is None and not robot.needs_charge
+
+    def __len__(self):
+        return len(self.location)
+
+    def __contains__(self, robot):
+        return robot in self.location
+
+    def update(self, robot):
+        if self.is_available(robot):
+            self.add(robot)
+        else:
+            self.discard(robot)
+
+    def add(self, robot):
+        pos = robot.pos
+        bucket = (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+        previous = self.location.get(robot)
+        if previous is not None:
+            if previous[1] == bucket:
+                self.location[robot] = (pos, bucket)
+                return
+            self.buckets[previous[1]].discard(robot)
+
+        self.buckets.setdefault(bucket, set()).add(robot)
+        self.location[robot] = (pos, bucket)
+
+    def discard(self, robot):
+        previous = self.location.pop(robot, None)
+        if previous is not None:
+            self.buckets[previous[1]].discard(robot)
+
+    def nearest(self, position):
+        # Recorre anillos de cubetas alrededor de la posición y se detiene cuando
+        # la distancia mínima posible del anillo supera la mejor encontrada.
+        # Los empates se resuelven por (x, y) como al recorrer el grid.
+        self.queries += 1
+        if not self.location:
+            return None
+
+        size = self.bucket_size
+        px, py = position
+        bx, by = px // size, py // size
+        max_ring = max(bx, by, (self.width - 1) // size - bx, (self.height - 1) // size - by)
+
+        best = None
+        best_key = None
+        for ring in range(max_ring + 1):
+            if best is not None and (ring - 1) * size + 1 > best_key[0]:
+                break
+
+            for bucket in self._ring(bx, by, ring):
+                for robot in self.buckets.get(bucket, ()):
+                    x, y = self.location[robot][0]
+                    key = (abs(px - x) + abs(py - y), x, y, robot.unique_id)
+                    if best_key is None or key < best_key:
+                        best, best_key = robot, key
+
+        return best
+
+    @staticmethod
+    def _ring(bx, by, ring):
+        if ring == 0:
+            yield bx, by
+            return
+
+        for x in range(bx - ring, bx + ring + 1):
+            yield x, by - ring
+            yield x, by + ring
+        for y in range(by - ring + 1, by + ring):
+            yield bx - ring, y
+            yield bx + ring, y
@@ -0,0 +1,55 @@
+import json
+
+CATEGORIES = ["Robots", "ConveyorBelts", "Shelves", "Boxes", "Chargers"]
+
+
+def delta(previous, current):
+    # Solo los agentes que cambiaron o aparecieron, y los ids de los que desaparecieron
+    changes = {}
+    removed = {}
+    for category in CATEGORIES:
+        before = {item["unique_id"]: item for item in previous[category]}
+        after_ids = set()
+        changed = []
+        for item in current[category]:
+            after_ids.add(item["unique_id"])
+            if before.get(item["unique_id"]) != item:
+                changed.append(item)
+        gone = [unique_id for unique_id in before if unique_id not in after_ids]
+
+        if changed:
+            changes[category] = changed
+        if gone:
+            removed[category] = gone
+
+    if removed:
+        changes["removed"] = removed
+    return changes
+
+
+def apply_delta(state, changes):
+    # Reconstruye el estado completo en el cliente a partir del anterior y un delta
+    removed = changes.get("removed", {})
+    result = {}
+    for category in CATEGORIES:
+        items = {item["unique_id"]: item for item in state[category]}
+        for unique_id in removed.get(category, []):
+            items.pop(unique_id, None)
+        for item in changes.get(category, []):
+            items[item["unique_id"]] = item
+        result[category] = list(items.values())
+    return result
+
+
+def delta_lines(states):
+    # Un fotograma completo y después un delta por paso, en JSON delimitado por líneas, de (paso, estado). "step" es
+    # el paso del modelo (warehouse.steps), el mismo que en sample_every, el feed y los fotogramas binarios
+    previous = None
+    for step, current in states:
+        if previous is None:
+            line = {"step": step, "keyframe": True, **current}
+        else:
+            line = {"step": step, **delta(previous, current)}
+
+        previous = current
+        yield json.dumps(line, separators=(",", ":")) + "\n"
@@ -0,0 +1,38 @@
+import numpy as np
+
+from batch import COLUMNS, save, summary, sweep
+from layout import Layout
+from model import Warehouse
+
+
+def test_sweep_matches_single_runs(tmp_path):
+    results = sweep([3, 6], [0.37], range(2), 100, processes=2)
+    assert list(results["num_robots"]) == [3, 3, 6, 6] and list(results["seed"]) == [0, 1, 0, 1]
+    assert set(results) == set(COLUMNS)
+
+    for num_robots, seed, stored in zip(results["num_robots"], results["seed"], results["boxes_stored"]):
+        model = Warehouse(int(num_robots), 0.37, collect_data=False, seed=int(seed))
+        for _ in range(100):
+            model.step()
+        assert model.boxes_stored == stored
+
+    save(results, str(tmp_path / "results.npz"))
+    with np.load(tmp_path / "results.npz") as loaded:
+        assert all(np.array_equal(loaded[column], results[column]) for column in COLUMNS)
+    save(results, str(tmp_path / "results.csv"))
+    lines = (tmp_path / "results.csv").read_text().splitlines()
+    assert lines[0] == ",".join(COLUMNS) and len(lines) == 5
+
+    assert summary(results).splitlines()[0].split() == ["robots", "box_pct", "boxes/step", "idle", "low", "bat",
+                                                         "runs"]
+
+
+def test_sweep_with_a_layout_and_options():
+    layout = Layout.generate(40, 30, belts=2)
+    results = sweep([20], [0.37], range(1), 50, layout, processes=1, planner="flow", dispatch="batch",
+                    charging="managed")
+    model = Warehouse(20, 0.37, layout, collect_data=False, seed=0, planner="flow", dispatch="batch",
+                      charging="managed")
+    for _ in range(50):
+        model.step()
+    assert results["boxes_stored"].tolist() == [model.boxes_stored]
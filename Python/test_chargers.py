@@ -0,0 +1,43 @@
+from layout import Layout
+from model import Warehouse
+
+
+def test_managed_charging_with_reservations_never_shares_a_cell():
+    # Un robot que recibe cargador mientras se aparta termina su ruta reservada antes de ir a cargar
+    model = Warehouse(60, 0.37, Layout.generate(40, 30, belts=2), seed=2, planner="reservation", charging="managed")
+    for _ in range(200):
+        model.step()
+        assert len({robot.pos for robot in model.robots}) == len(model.robots), model.steps
+    assert model.charger_manager.requests > 0
+
+
+def test_queue_is_served_in_arrival_order():
+    model = Warehouse(20, 0.37, seed=1, charging="managed")
+    manager = model.charger_manager
+    robots = sorted(model.robots, key=lambda robot: robot.unique_id)
+    for robot in robots[:len(manager.usable) + 2]:
+        manager.request(robot)
+    first, second = manager.queue
+    assert [robot.charger for robot in (first, second)] == [None, None]
+
+    charger, holder = next(iter(manager.reserved.items()))
+    manager.release(holder)
+    assert manager.reserved[charger] is first and first.charger == charger
+    assert first.destination == manager.docks[charger]
+    assert manager.queue == [second] and manager.charges == 1
+
+
+def test_wait_estimates_include_travel_and_charge():
+    model = Warehouse(20, 0.37, seed=1, charging="managed")
+    manager = model.charger_manager
+    robots = sorted(model.robots, key=lambda robot: robot.unique_id)
+    for robot in robots[:len(manager.usable) + 3]:
+        manager.request(robot)
+    waits = [entry["estimated_wait"] for entry in manager.summary()["queue"]]
+    assert len(waits) == 3
+    assert all(wait > 0 for wait in waits)
+    # El primero de la cola espera lo que tarde el primer cargador en quedar libre y luego va hasta él
+    free = min(manager.travel(robot.pos, manager.docks[charger]) +
+               manager.charge_steps(robot.battery - 0.5 * manager.travel(robot.pos, manager.docks[charger]))
+               for charger, robot in manager.reserved.items())
+    assert waits[0] >= free
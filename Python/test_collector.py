@@ -0,0 +1,52 @@
+import io
+import os
+
+import numpy as np
+
+from batch import run_simulation
+from collector import ArrayCollector
+from model import Warehouse
+
+
+def run(model, steps):
+    for _ in range(steps):
+        model.step()
+    return model
+
+
+def test_max_steps_keeps_the_latest_chunks():
+    # Se descartan bloques enteros (CHUNK_SIZE pasos) mientras sigan quedando max_steps pasos
+    full = run(Warehouse(5, 0.37, seed=1), 3500).datacollector.arrays()
+    bounded = run(Warehouse(5, 0.37, seed=1, collect_max_steps=1024), 3500).datacollector
+    arrays = bounded.arrays()
+    assert 1024 <= len(arrays["steps"]) < 2048
+    assert arrays["steps"][-1] == 3499
+    first = len(full["steps"]) - len(arrays["steps"])
+    assert np.array_equal(arrays["robots"], full["robots"][first:])
+
+
+def test_spilled_history_matches_memory(tmp_path):
+    memory = run(Warehouse(5, 0.37, seed=1), 300).datacollector.arrays()
+    model = run(Warehouse(5, 0.37, seed=1, collect_spill_dir=str(tmp_path)), 300)
+    model.datacollector.close()
+    spilled = ArrayCollector.load(str(tmp_path))
+    for key in ("steps", "robots", "shelves", "boxes"):
+        assert np.array_equal(spilled[key], memory[key])
+
+
+def test_settings_survive_fork_and_snapshots(tmp_path):
+    model = run(Warehouse(5, 0.37, seed=1, collect_max_steps=200, collect_spill_dir=str(tmp_path)), 10)
+    fork = model.fork()
+    assert fork.datacollector.max_steps == 200 and fork.datacollector.spill_dir is None
+
+    file = io.BytesIO()
+    model.save(file)
+    file.seek(0)
+    assert Warehouse.load(file).datacollector.max_steps == 200
+
+
+def test_batch_spills_each_run(tmp_path):
+    run_simulation((5, 0.37, 0, 300, None, None, None, None, None, None, None, str(tmp_path)))
+    run_directory = tmp_path / "robots5_boxes0.37_seed0"
+    assert len(ArrayCollector.load(str(run_directory))["steps"]) == 300
+    assert os.listdir(run_directory)
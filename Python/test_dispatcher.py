@@ -0,0 +1,48 @@
+import itertools
+import random
+
+import pytest
+
+from dispatcher import hungarian
+from model import Warehouse
+
+
+@pytest.mark.parametrize("rows, cols", [(1, 1), (3, 3), (3, 5), (5, 3), (6, 6)])
+def test_hungarian_matches_brute_force(rows, cols):
+    rng = random.Random(rows * 10 + cols)
+    for _ in range(20):
+        cost = [[rng.randint(0, 20) for _ in range(cols)] for _ in range(rows)]
+        pairs = hungarian(cost)
+        assert len(pairs) == min(rows, cols)
+        assert len({row for row, _ in pairs}) == len({col for _, col in pairs}) == len(pairs)
+        if rows <= cols:
+            best = min(sum(cost[row][col] for row, col in enumerate(perm))
+                       for perm in itertools.permutations(range(cols), rows))
+        else:
+            best = min(sum(cost[row][col] for col, row in enumerate(perm))
+                       for perm in itertools.permutations(range(rows), cols))
+        assert sum(cost[row][col] for row, col in pairs) == best
+
+
+def test_free_slots_see_retrieved_shelves():
+    model = Warehouse(5, 0.37, seed=1, dispatch="batch")
+    dispatcher, shelf_index = model.dispatcher, model.shelf_index
+    pickup = sorted(dispatcher.order)[0]
+    slots = [pos for pos in dispatcher.order[pickup] if shelf_index.is_free(pos)]
+    for pos in slots[:3]:
+        shelf_index.store(shelf_index.at[pos], object())
+    assert dispatcher.free_slots(pickup, 1) == [slots[3]]
+
+    # El cursor ya pasó del hueco que se libera: tiene que volver a verlo
+    shelf_index.retrieve(shelf_index.at[slots[1]])
+    assert dispatcher.free_slots(pickup, 2) == [slots[1], slots[3]]
+
+
+def test_batch_dispatch_never_shares_a_slot():
+    model = Warehouse(20, 0.37, seed=2, dispatch="batch")
+    for _ in range(300):
+        model.step()
+        shelves = [robot.shelf for robot in model.robots if robot.shelf is not None]
+        assert len(shelves) == len(set(shelves)) == len(model.dispatcher.reserved)
+        assert all(model.shelf_index.is_free(pos) for pos in shelves)
+    assert model.dispatcher.assigned > 0
@@ -0,0 +1,57 @@
+import random
+from collections import deque
+
+from layout import Layout
+from model import Warehouse
+
+
+def bfs_distance(pathfinder, start, ends):
+    # Referencia: BFS desde start hasta la primera celda de ends, solo con los obstáculos estáticos
+    seen = {start: 0}
+    frontier = deque([start])
+    while frontier:
+        x, y = frontier.popleft()
+        if (x, y) in ends:
+            return seen[(x, y)]
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < pathfinder.width and 0 <= ny < pathfinder.height and not pathfinder.static[nx, ny] and \
+                    (nx, ny) not in seen:
+                seen[(nx, ny)] = seen[(x, y)] + 1
+                frontier.append((nx, ny))
+    return None
+
+
+def test_distances_and_routes_are_shortest_paths():
+    model = Warehouse(20, 0.37, Layout.generate(40, 30, belts=2), seed=1, planner="flow")
+    fields, pathfinder = model.fields, model.pathfinder
+    rng = random.Random(1)
+    free = [(x, y) for x in range(pathfinder.width) for y in range(pathfinder.height) if not pathfinder.static[x, y]]
+    targets = sorted(model.layout.pickup_points) + model.chargers + [pos for row in model.shelves for pos in row]
+    for _ in range(300):
+        start, end = rng.choice(free), rng.choice(targets + free)
+        expected = bfs_distance(pathfinder, start, set(fields.access(end)))
+        assert fields.distance(start, end) == expected
+
+        route = fields.route(start, end)
+        if expected is None:
+            assert route == [-1]
+            continue
+        assert route[0] == start and len(route) == expected + 1 and route[-1] in fields.access(end)
+        assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 and not pathfinder.static[b]
+                   for a, b in zip(route, route[1:]))
+
+
+def test_shelf_fields_are_bounded_and_pinned_ones_shared():
+    layout = Layout.generate(40, 30, belts=2)
+    model = Warehouse(20, 0.37, layout, seed=1, planner="flow")
+    fields = model.fields
+    pinned = len(fields.pinned)
+    fields.max_fields = 5
+    for pos in [pos for row in model.shelves for pos in row][:20]:
+        fields.field(pos)
+    assert len(fields.fields) == 5 and len(fields.pinned) == pinned
+
+    # Otro almacén del mismo layout reutiliza los campos fijos en vez de recalcularlos
+    other = Warehouse(20, 0.37, layout, seed=2, planner="flow")
+    assert other.fields.computed == 0
+    assert all(other.fields.pinned[target] is fields.pinned[target] for target in fields.pinned)
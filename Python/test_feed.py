@@ -0,0 +1,87 @@
+import json
+
+from feed import Frame, FeedManager, Subscriber
+from model import Warehouse
+from simulations import SimulationManager
+from streaming import CATEGORIES, apply_delta
+
+
+def parse(event):
+    lines = dict(line.split(": ", 1) for line in event.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+def replay(events):
+    # Estados que reconstruye un cliente a partir de sus eventos
+    state, states = None, []
+    for event in events:
+        kind, data = parse(event)
+        step = data.pop("step")
+        data.pop("dropped", None)
+        state = {category: data[category] for category in CATEGORIES} if data.pop("keyframe", False) \
+            else apply_delta(state, data)
+        states.append((step, state))
+    return states
+
+
+def reference(steps):
+    model = Warehouse(5, 0.37, seed=4, collect_data=False)
+    states = {}
+    for _ in range(steps):
+        model.step()
+        states[model.steps] = json.loads(json.dumps(model.collect_detailed_data()))
+    return states
+
+
+def test_viewers_share_steps_and_rebuild_the_run():
+    manager = SimulationManager()
+    simulation_id = manager.create(Warehouse(5, 0.37, seed=4, collect_data=False))
+    feeds = FeedManager(manager)
+    feed, first = feeds.subscribe(simulation_id, rate=50, buffer=64)
+    joined, second = feeds.subscribe(simulation_id, rate=50, buffer=64)
+    assert joined is feed and len(feeds) == 1
+
+    events = {first: [], second: []}
+    while len(events[second]) < 10:
+        for subscriber in events:
+            event = subscriber.next(5)
+            if event:
+                events[subscriber].append(event)
+    feed.unsubscribe(first)
+    feed.unsubscribe(second)
+    feed.thread.join(5)
+    assert feed.stopped and len(feeds) == 0
+
+    expected = reference(feed.steps)
+    for received in events.values():
+        for step, state in replay(received):
+            key = lambda item: item["unique_id"]
+            assert all(sorted(state[category], key=key) == sorted(expected[step][category], key=key)
+                       for category in CATEGORIES)
+    assert parse(events[second][0])[0] == "keyframe"
+
+
+def test_slow_viewer_gets_a_keyframe_after_drops():
+    model = Warehouse(5, 0.37, seed=4)
+    subscriber = Subscriber(buffer=2)
+    previous = None
+    for _ in range(5):
+        model.step()
+        frame = Frame(model.steps, model.collect_detailed_data(), previous)
+        previous = frame.state
+        subscriber.push(frame)
+    kind, data = parse(subscriber.next(0))
+    assert kind == "keyframe" and data["step"] == 5 and data["dropped"] == 4
+    assert subscriber.total_dropped == 4 and subscriber.next(0) == ""
+
+
+def test_feed_ends_when_the_simulation_disappears():
+    manager = SimulationManager()
+    simulation_id = manager.create(Warehouse(5, 0.37, seed=4))
+    feeds = FeedManager(manager)
+    feed, subscriber = feeds.subscribe(simulation_id, rate=50)
+    manager.remove(simulation_id)
+    while subscriber.next(5) is not None:
+        pass
+    feed.thread.join(5)
+    assert feed.stopped and feed.subscribe() is None and len(feeds) == 0
@@ -0,0 +1,42 @@
+import pytest
+
+from layout import Layout
+from model import Warehouse
+
+MODES = [{}, {"planner": "flow", "dispatch": "batch"}, {"planner": "reservation", "charging": "managed"}]
+
+
+@pytest.mark.parametrize("mode", MODES, ids=lambda mode: "-".join(mode.values()) or "default")
+def test_fork_matches_a_fresh_warehouse(mode):
+    layout = Layout.generate(40, 30, belts=2)
+    parent = Warehouse(30, 0.37, layout, seed=1, route_cache=128, **mode)
+    for _ in range(20):
+        parent.step()
+
+    fork = parent.fork(seed=9)
+    fresh = Warehouse(30, 0.37, Layout.from_dict(layout.to_dict()), seed=9, route_cache=128, **mode)
+    assert fork.steps == 0 and fork.layout is parent.layout
+    for _ in range(150):
+        fork.step()
+        fresh.step()
+        assert fork.collect_detailed_data() == fresh.collect_detailed_data()
+    assert fork.counters() == fresh.counters()
+
+
+def test_fork_overrides_and_shares_the_static_layout():
+    parent = Warehouse(10, 0.37, seed=1)
+    fork = parent.fork(num_robots=4, seed=2, planner="flow")
+    assert fork.num_robots == 4 and fork.planner == "flow" and len(fork.robots) == 4
+    assert fork.layout.static() is parent.layout.static()
+    # El mapa de cada almacén es suyo: la capa de robots no se comparte
+    assert fork.pathfinder.robots is not parent.pathfinder.robots
+    assert fork.pathfinder.robots.sum() == 4 and parent.pathfinder.robots.sum() == 10
+
+
+def test_construction_from_a_layout_is_reproducible():
+    layout = Layout.generate(90, 60, belts=2, charger_banks=2)
+    first = Warehouse(200, 0.37, layout, seed=3)
+    second = Warehouse(200, 0.37, Layout.from_dict(layout.to_dict()), seed=3)
+    assert first.collect_detailed_data() == second.collect_detailed_data()
+    assert len({robot.pos for robot in first.robots}) == 200
+    assert not any(first.pathfinder.static[robot.pos] for robot in first.robots)
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import sys
+
+import pytest
+
+from layout import Layout
+from model import Warehouse
+
+# Resúmenes grabados del estado (collect_detailed_data) cada CHECKPOINT pasos. Las reglas por defecto fijan el
+# comportamiento del modelo original; los modos, el de cada opción. Si un cambio los altera a propósito, se
+# vuelven a grabar con: python test_golden.py
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_states.json")
+STEPS = 200
+CHECKPOINT = 50
+
+CASES = {
+    f"{name}-seed{seed}": (num_robots, layout, seed, {})
+    for name, num_robots, layout in [("default-5", 5, None), ("default-20", 20, None),
+                                     ("generated-40", 40, (40, 30, 1))]
+    for seed in (0, 1)
+}
+CASES.update({
+    "reservation": (20, None, 3, {"planner": "reservation"}),
+    "flow": (20, None, 3, {"planner": "flow"}),
+    "batch": (20, None, 3, {"dispatch": "batch"}),
+    "managed": (20, None, 3, {"charging": "managed"}),
+    "flow-batch-managed": (40, (40, 30, 2), 3, {"planner": "flow", "dispatch": "batch", "charging": "managed"}),
+})
+
+
+def digests(name):
+    num_robots, layout, seed, mode = CASES[name]
+    layout = Layout.generate(*layout[:2], belts=layout[2]) if layout else None
+    model = Warehouse(num_robots, 0.37, layout, seed=seed, **mode)
+    digest = hashlib.sha1()
+    result = []
+    for step in range(1, STEPS + 1):
+        model.step()
+        digest.update(json.dumps(model.collect_detailed_data(), sort_keys=True).encode())
+        if step % CHECKPOINT == 0:
+            result.append(digest.hexdigest())
+    return result
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_states_match_recording(name):
+    with open(GOLDEN) as file:
+        golden = json.load(file)
+    assert digests(name) == golden[name]
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or sorted(CASES)
+    golden = {}
+    if os.path.exists(GOLDEN):
+        with open(GOLDEN) as file:
+            golden = json.load(file)
+    golden.update({name: digests(name) for name in names})
+    with open(GOLDEN, "w") as file:
+        json.dump(golden, file, indent=2, sort_keys=True)
+        file.write("\n")
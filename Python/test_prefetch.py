@@ -0,0 +1,60 @@
+import time
+
+import Flask
+import wire
+from model import Warehouse
+from prefetch import Prefetcher, PrefetchManager
+from simulations import SimulationManager
+
+
+def reference(steps):
+    model = Warehouse(5, 0.37, seed=3)
+    states = []
+    for _ in range(steps):
+        model.step()
+        states.append(model.collect_detailed_data())
+    return states
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_take_only_computes_the_requested_format():
+    model = Warehouse(5, 0.37, seed=3)
+    prefetcher = Prefetcher(SimulationManager(), None)
+    assert all(state is None and frame for _, state, frame in prefetcher.take(model, 3, binary=True))
+    assert all(state and frame is None for _, state, frame in prefetcher.take(model, 3))
+
+
+def test_buffered_steps_match_an_uninterrupted_run():
+    manager = SimulationManager()
+    simulation_id = manager.create(Warehouse(5, 0.37, seed=3))
+    prefetchers = PrefetchManager(manager, max_frames=8, idle=1)
+    states = reference(24)
+
+    served = prefetchers.run(simulation_id, 8)
+    prefetcher = prefetchers.prefetchers[simulation_id]
+    # El hilo calcula el siguiente lote mientras el cliente no pide nada
+    wait_for(lambda: prefetcher.buffered == 8)
+    served += [state for _, state in wire.decode(prefetchers.run(simulation_id, 8, binary=True))]
+    wait_for(lambda: prefetcher.buffered == 8)
+    served += prefetchers.run(simulation_id, 8)
+
+    assert served == states
+    assert prefetcher.prefetched == 16 and prefetcher.computed == 8
+
+
+def test_metrics_report_how_far_ahead_the_model_runs():
+    model = Warehouse(5, 0.37, seed=3)
+    prefetcher = Prefetcher(SimulationManager(), None)
+    prefetcher.take(model, 4)
+    for _ in range(3):
+        model.step()
+        model.prefetched.append((model.steps, model.collect_detailed_data(), wire.pack_frame(model)))
+
+    summary = Flask.profiler_metrics(model, {})
+    assert summary["delivered_step"] == 4 and summary["prefetched_steps"] == 3
@@ -0,0 +1,72 @@
+import pytest
+
+from layout import Layout
+from model import Warehouse
+from pathfinding import PathFinder
+from reservations import ReservationTable
+
+
+class FakeRobot:
+    def __init__(self, unique_id):
+        self.unique_id = unique_id
+        self.destination = (0, 0)
+
+
+def empty_table(width=6, height=4):
+    return ReservationTable(PathFinder(width, height, [], [], []))
+
+
+@pytest.mark.parametrize("layout, num_robots, mode", [
+    (None, 20, {}),
+    (Layout.generate(40, 30, belts=2), 60, {}),
+    (Layout.generate(40, 30, belts=2), 60, {"dispatch": "batch", "charging": "managed"}),
+], ids=["default", "generated", "generated-batch-managed"])
+def test_robots_never_share_or_swap_cells(layout, num_robots, mode):
+    model = Warehouse(num_robots, 0.37, layout, seed=3, planner="reservation", **mode)
+    before = {robot: robot.pos for robot in model.robots}
+    for _ in range(300):
+        model.step()
+        after = {robot: robot.pos for robot in model.robots}
+        assert len(set(after.values())) == len(after), model.steps
+        moved = {(before[robot], after[robot]) for robot in after if before[robot] != after[robot]}
+        assert not any((end, start) in moved for start, end in moved), model.steps
+        before = after
+    assert model.boxes_stored > 0
+
+
+def test_planned_routes_respect_reservations():
+    table = empty_table()
+    first, second = FakeRobot(1), FakeRobot(2)
+    # first cruza la fila 1 de izquierda a derecha; second la recorre en sentido contrario
+    route = table.plan(first, (0, 1), 0, 0, (5, 1))
+    assert route[0] == (0, 1) and route[-1] == (5, 1)
+    other = table.plan(second, (5, 2), 0, 0, (0, 1))
+    assert other != [-1] and other[-1] == (0, 1)
+
+    for time in range(max(len(route), len(other))):
+        a = route[min(time, len(route) - 1)]
+        b = other[min(time, len(other) - 1)]
+        assert a != b
+        if 0 < time < min(len(route), len(other)):
+            assert (route[time - 1], route[time]) != (other[time], other[time - 1])
+
+
+def test_release_frees_every_cell():
+    table = empty_table()
+    robot = FakeRobot(1)
+    route = table.plan(robot, (0, 0), 2, 0, (5, 3))
+    assert table.owner((0, 0), 1) is robot and table.owner(route[-1], 100) is robot
+    table.release(robot)
+    assert not table.cells and not table.parked and robot not in table.owned
+
+
+def test_blocked_goal_backs_off():
+    table = empty_table()
+    parked = FakeRobot(1)
+    parked.destination = (3, 3)
+    table.park(parked, (5, 3), 0)
+    robot = FakeRobot(2)
+    assert table.plan(robot, (0, 0), 0, 0, (5, 3)) == [-1]
+    assert table.failures == 1 and table.retry_at[robot] == table.backoff
+    # Hasta el reintento ni siquiera se busca
+    assert table.plan(robot, (0, 0), 1, 1, (5, 3)) == [-1] and table.failures == 1
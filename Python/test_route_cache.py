@@ -0,0 +1,58 @@
+import Flask
+from batch import run_simulation
+from model import Warehouse
+from pathfinding import RouteCache
+
+
+def valid(pathfinder, route, start, robots=True):
+    # Empieza en start, avanza de una en una y no pisa obstáculos (ni robots, salvo en start)
+    if route[0] != start:
+        return False
+    for previous, pos in zip(route, route[1:]):
+        if abs(previous[0] - pos[0]) + abs(previous[1] - pos[1]) != 1 or pathfinder.static[pos]:
+            return False
+        if robots and pathfinder.robots[pos]:
+            return False
+    return True
+
+
+def test_cached_routes_are_repaired_around_robots():
+    model = Warehouse(20, 0.37, seed=1)
+    pathfinder = model.pathfinder
+    cache = pathfinder.cache = RouteCache(64)
+    free = [(x, y) for x in range(pathfinder.width) for y in range(pathfinder.height)
+            if not pathfinder.static[x, y] and not pathfinder.robots[x, y]]
+    queries = [(start, end) for start in free[:6] for end in model.layout.pickup_points]
+    for start, end in queries * 2:
+        route = pathfinder.route(start, end)
+        assert route == [-1] or valid(pathfinder, route, start)
+    assert cache.misses == len(set(queries)) and cache.hits == len(queries)
+
+
+def test_counters_and_profiler_include_the_route_cache():
+    model = Warehouse(20, 0.37, seed=1, route_cache=256)
+    model.profiler.enable()
+    for _ in range(300):
+        model.step()
+    counters = model.counters()
+    stats = model.pathfinder.cache.stats()
+    assert counters["route_cache_hits"] == stats["hits"] > 0
+    assert counters["route_cache_misses"] == stats["misses"] > 0
+    assert model.profiler.summary()["counts"]["route_cache_hits"] == stats["hits"]
+
+    summary = Flask.profiler_metrics(model, {})
+    assert summary["route_cache"] == stats
+    assert Warehouse(5, 0.37, seed=1).counters()["route_cache_hits"] == 0
+
+
+def test_route_cache_from_the_service_and_batch():
+    client = Flask.app.test_client()
+    response = client.post("/warehouseSimulations?seed=1&route_cache=32")
+    simulation_id = response.get_json()["warehouseId"]
+    assert Flask.robotsSimulations.get(simulation_id).model.pathfinder.cache.max_routes == 32
+    assert client.post("/warehouseSimulations?route_cache=0").status_code == 400
+    Flask.robotsSimulations.remove(simulation_id)
+
+    cached = run_simulation((5, 0.37, 0, 100, None, None, None, None, 256, None, None, None))
+    plain = run_simulation((5, 0.37, 0, 100, None, None, None, None, None, None, None, None))
+    assert cached["steps"] == plain["steps"] == 100
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from shelf_index import ShelfIndex
+
+
+class Shelf:
+    def __init__(self, pos):
+        self.pos = pos
+        self.limit = 1
+        self.stored_box = None
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def scan_nearest_free(rows, shelves, pos):
+    # El recorrido original de Robot: la fila con algún hueco más cercana a pos (por su primer estante) y en ella
+    # el hueco más cercano, quedándose con el primero en los empates
+    closest_row, row_distance = None, float('inf')
+    for row in rows:
+        if any(shelves[slot].stored_box is None for slot in row):
+            distance = manhattan(pos, row[0])
+            if distance < row_distance:
+                closest_row, row_distance = row, distance
+    if closest_row is None:
+        return None
+
+    closest, slot_distance = None, float('inf')
+    for slot in closest_row:
+        if shelves[slot].limit > 0 and shelves[slot].stored_box is None:
+            distance = manhattan(pos, slot)
+            if distance < slot_distance:
+                closest, slot_distance = slot, distance
+    return closest
+
+
+def random_rows(rng):
+    # Filas horizontales, verticales e irregulares (en escalera) sin celdas repetidas
+    rows = []
+    for y in range(0, 20, 2):
+        start = rng.randrange(0, 10)
+        rows.append([(x, y) for x in range(start, start + rng.randrange(1, 12))])
+    for x in range(30, 50, 2):
+        start = rng.randrange(0, 10)
+        rows.append([(x, y) for y in range(start, start + rng.randrange(1, 12))])
+    for x in range(60, 80, 4):
+        y = rng.randrange(0, 10)
+        row = []
+        for step in range(rng.randrange(2, 10)):
+            row.append((x + step // 2, y + (step + 1) // 2))
+        rows.append(row)
+    rng.shuffle(rows)
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_nearest_free_matches_scan(seed):
+    rng = random.Random(seed)
+    rows = random_rows(rng)
+    shelves = {pos: Shelf(pos) for row in rows for pos in row}
+    index = ShelfIndex(rows, [shelves[pos] for row in rows for pos in row])
+
+    for _ in range(3000):
+        shelf = shelves[rng.choice(list(shelves))]
+        if rng.random() < 0.6:
+            if shelf.stored_box is None:
+                index.store(shelf, object())
+        else:
+            index.retrieve(shelf)
+
+        pos = (rng.randrange(-5, 90), rng.randrange(-5, 30))
+        assert index.nearest_free(pos) == scan_nearest_free(rows, shelves, pos)
+        assert len(index) == sum(shelf.stored_box is None for shelf in shelves.values())
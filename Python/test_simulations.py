@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from model import Warehouse
+from prefetch import advance
+from simulations import SimulationManager, SimulationNotFound, estimate_memory
+
+
+def evicted_to_disk(tmp_path, load):
+    # Un gestor con sitio para una simulación y la primera ya expulsada a su snapshot
+    manager = SimulationManager(max_simulations=1, snapshot_dir=str(tmp_path), load=load)
+    first = manager.create(Warehouse(5, 0.37, seed=1))
+    manager.run(first, lambda model: model.step())
+    second = manager.create(Warehouse(5, 0.37, seed=2))
+    assert first not in manager.simulations and second in manager.simulations
+    return manager, first, second
+
+
+def test_create_never_evicts_the_new_simulation(tmp_path):
+    manager, first, second = evicted_to_disk(tmp_path, Warehouse.load)
+    assert manager.run(first, lambda model: model.steps) == 1
+    assert len(manager) == 1
+
+
+def test_restore_runs_outside_the_manager_lock(tmp_path):
+    started, resume = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_load(path):
+        loads.append(path)
+        started.set()
+        assert resume.wait(5)
+        return Warehouse.load(path)
+
+    manager, first, second = evicted_to_disk(tmp_path, slow_load)
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(manager.get(first))) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    assert started.wait(5)
+
+    # Mientras se carga, el resto de simulaciones siguen atendiéndose
+    assert manager.run(second, lambda model: model.steps) == 0
+    manager.create(Warehouse(5, 0.37, seed=3))
+    assert first in manager
+
+    resume.set()
+    for reader in readers:
+        reader.join(5)
+    assert len(loads) == 1
+    assert len(results) == 3 and all(simulation is results[0] for simulation in results)
+    assert results[0].model.steps == 1
+
+
+def test_remove_while_restoring(tmp_path):
+    started, resume = threading.Event(), threading.Event()
+
+    def slow_load(path):
+        started.set()
+        assert resume.wait(5)
+        return Warehouse.load(path)
+
+    manager, first, _ = evicted_to_disk(tmp_path, slow_load)
+    errors = []
+
+    def reader():
+        try:
+            manager.get(first)
+        except SimulationNotFound as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    assert started.wait(5)
+    manager.remove(first)
+    resume.set()
+    thread.join(5)
+    assert len(errors) == 1 and first not in manager
+
+
+def test_memory_estimate_counts_prefetched_steps_and_cached_routes():
+    model = Warehouse(10, 0.37, seed=1, route_cache=256)
+    base = estimate_memory(model)
+    for _ in range(50):
+        model.step()
+    with_routes = estimate_memory(model)
+    assert len(model.pathfinder.cache) > 0 and with_routes > base
+
+    model.prefetched.extend(list(advance(model, 20)))
+    assert estimate_memory(model) > with_routes
+
+
+def test_unknown_simulation():
+    manager = SimulationManager()
+    with pytest.raises(SimulationNotFound):
+        manager.get("00000000-0000-0000-0000-000000000000")
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from layout import Layout
+from model import Warehouse
+
+MODES = [
+    {},
+    {"planner": "reservation"},
+    {"planner": "flow"},
+    {"dispatch": "batch"},
+    {"charging": "managed"},
+    {"planner": "flow", "dispatch": "batch", "charging": "managed"},
+]
+
+
+@pytest.mark.parametrize("mode", MODES, ids=lambda mode: "-".join(mode.values()) or "default")
+@pytest.mark.parametrize("layout, num_robots", [(None, 10), (Layout.generate(40, 30, belts=2), 20)],
+                         ids=["default", "generated"])
+def test_save_load_continue_matches_uninterrupted_run(mode, layout, num_robots):
+    # Guardar, cargar y seguir da los mismos pasos que la simulación sin interrumpir
+    uninterrupted = Warehouse(num_robots, 0.37, layout, seed=7, **mode)
+    restored = Warehouse(num_robots, 0.37, layout, seed=7, **mode)
+    for _ in range(150):
+        uninterrupted.step()
+        restored.step()
+
+    file = io.BytesIO()
+    restored.save(file)
+    file.seek(0)
+    restored = Warehouse.load(file)
+    assert restored.steps == uninterrupted.steps
+
+    for _ in range(150):
+        uninterrupted.step()
+        restored.step()
+        assert restored.collect_detailed_data() == uninterrupted.collect_detailed_data()
+    assert restored.boxes_stored == uninterrupted.boxes_stored
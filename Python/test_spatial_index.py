@@ -0,0 +1,52 @@
+import random
+
+from model import Warehouse
+from spatial_index import RobotIndex
+
+
+class FakeRobot:
+    def __init__(self, unique_id, pos):
+        self.unique_id = unique_id
+        self.pos = pos
+        self.battery = 100
+        self.destination = None
+        self.needs_charge = False
+
+
+def brute_force(robots, position):
+    # El recorrido original: el disponible más cercano, con los empates por (x, y)
+    available = [robot for robot in robots if RobotIndex.is_available(robot)]
+    return min(available, key=lambda robot: (abs(position[0] - robot.pos[0]) + abs(position[1] - robot.pos[1]),
+                                             robot.pos[0], robot.pos[1], robot.unique_id), default=None)
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(3)
+    width, height = 50, 37
+    index = RobotIndex(width, height)
+    robots = [FakeRobot(i, (rng.randrange(width), rng.randrange(height))) for i in range(60)]
+    for robot in robots:
+        index.update(robot)
+
+    for _ in range(500):
+        robot = rng.choice(robots)
+        change = rng.random()
+        if change < 0.6:
+            robot.pos = (rng.randrange(width), rng.randrange(height))
+        elif change < 0.8:
+            robot.battery = rng.choice([20, 100])
+        else:
+            robot.destination = rng.choice([None, (0, 0)])
+        index.update(robot)
+
+        position = (rng.randrange(width), rng.randrange(height))
+        assert index.nearest(position) is brute_force(robots, position)
+
+
+def test_index_follows_the_model():
+    model = Warehouse(20, 0.37, seed=5)
+    for _ in range(300):
+        model.step()
+        available = {robot for robot in model.robots if RobotIndex.is_available(robot)}
+        assert set(model.robot_index.location) == available
+        assert all(model.robot_index.location[robot][0] == robot.pos for robot in available)
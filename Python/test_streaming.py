@@ -0,0 +1,65 @@
+import json
+
+import Flask
+from model import Warehouse
+from streaming import CATEGORIES, apply_delta, delta, delta_lines
+
+
+def states(steps, seed=2):
+    model = Warehouse(10, 0.37, seed=seed)
+    result = []
+    for _ in range(steps):
+        model.step()
+        result.append((model.steps, model.collect_detailed_data()))
+    return result
+
+
+def same(a, b):
+    key = lambda item: item["unique_id"]
+    return all(sorted(a[category], key=key) == sorted(b[category], key=key) for category in CATEGORIES)
+
+
+def test_deltas_rebuild_every_state():
+    recorded = [state for _, state in states(150)]
+    rebuilt = recorded[0]
+    removed = 0
+    for previous, current in zip(recorded, recorded[1:]):
+        changes = delta(previous, current)
+        removed += len(changes.get("removed", {}).get("Boxes", []))
+        rebuilt = apply_delta(rebuilt, changes)
+        assert same(rebuilt, current)
+    assert removed > 0
+
+
+def test_delta_lines_start_with_a_keyframe():
+    lines = [json.loads(line) for line in delta_lines(states(5))]
+    assert lines[0]["keyframe"] and [line["step"] for line in lines] == [1, 2, 3, 4, 5]
+    assert not any("keyframe" in line for line in lines[1:])
+
+
+def test_delta_mode_streams_after_releasing_the_simulation():
+    client = Flask.app.test_client()
+    simulation_id = client.post("/warehouseSimulations?seed=2").get_json()["warehouseId"]
+    simulation = Flask.robotsSimulations.get(simulation_id)
+    try:
+        response = client.get(f"/warehouseSimulations/{simulation_id}?steps=20&mode=delta", buffered=False)
+        # Los pasos ya están calculados y el candado suelto antes de enviar nada
+        assert simulation.model.steps == 20 and not simulation.lock.locked()
+
+        reference = Warehouse(5, 0.37, seed=2, collect_data=False)
+        state = None
+        lines = [json.loads(line) for line in response.response]
+        for line in lines:
+            reference.step()
+            assert line.pop("step") == reference.steps
+            if line.pop("keyframe", False):
+                state = line
+            else:
+                state = apply_delta(state, line)
+            assert same(state, json.loads(json.dumps(reference.collect_detailed_data())))
+        assert len(lines) == 20
+    finally:
+        Flask.robotsSimulations.remove(simulation_id)
+
+    response = client.get(f"/warehouseSimulations/{simulation_id}?mode=delta")
+    assert response.status_code == 404
@@ -0,0 +1,29 @@
+import struct
+
+import pytest
+
+import wire
+from layout import Layout
+from model import Warehouse
+
+
+@pytest.mark.parametrize("layout, num_robots", [(None, 5), (Layout.generate(40, 30, belts=2), 40)],
+                         ids=["default", "generated"])
+def test_decode_matches_collect_detailed_data(layout, num_robots):
+    model = Warehouse(num_robots, 0.37, layout, seed=3, collect_data=False)
+    frames, states = [], []
+    for _ in range(120):
+        model.step()
+        frames.append(wire.pack_frame(model))
+        states.append((model.steps, model.collect_detailed_data()))
+
+    assert wire.decode(wire.encode(frames)) == states
+
+
+def test_decode_rejects_other_formats():
+    with pytest.raises(wire.WireError):
+        wire.decode(b"JSON" + bytes(8))
+
+    schema = b'{"version":99,"sections":[]}'
+    with pytest.raises(wire.WireError):
+        wire.decode(wire.MAGIC + struct.pack("<I", len(schema)) + schema)
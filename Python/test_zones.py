@@ -0,0 +1,40 @@
+import pytest
+
+from layout import Layout
+from model import Warehouse
+from zones import zone_starts
+
+
+@pytest.mark.parametrize("layout, num_robots, charging",
+                         [(None, 20, None), (Layout.generate(40, 30, belts=2), 60, None), (None, 20, "managed")],
+                         ids=["default", "generated", "managed"])
+def test_zones_match_single_process(layout, num_robots, charging):
+    # Las búsquedas adelantadas en las zonas dan los mismos pasos (y contadores) que sin zonas
+    single = Warehouse(num_robots, 0.37, layout, seed=4, charging=charging)
+    sharded = Warehouse(num_robots, 0.37, layout, seed=4, charging=charging, zones=3)
+    try:
+        for _ in range(300):
+            single.step()
+            sharded.step()
+            assert sharded.collect_detailed_data() == single.collect_detailed_data()
+        assert sharded.counters() == single.counters()
+        assert sharded.zone_workers.queries > 0
+    finally:
+        sharded.close()
+
+
+def test_zone_starts_cut_at_aisles():
+    layout = Layout.generate(60, 30)
+    shelf_columns = {x for row in layout.shelves for x, _ in row}
+    starts = zone_starts(layout, 4)
+    assert starts[0] == 0 and starts == sorted(set(starts))
+    assert not shelf_columns.intersection(starts[1:])
+
+
+def test_zones_need_the_default_planner():
+    with pytest.raises(ValueError):
+        Warehouse(5, 0.37, planner="reservation", zones=2)
+    with pytest.raises(ValueError):
+        Warehouse(5, 0.37, route_cache=256, zones=2)
+    with pytest.raises(ValueError):
+        Warehouse(5, 0.37, zones=0)
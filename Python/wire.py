@@ -0,0 +1,125 @@
+import json
+import struct
+
+import numpy as np
+
+# Formato binario del estado (Accept: application/vnd.warehouse.frames). Una
+# respuesta es MAGIC, la longitud (uint32) y el JSON de la cabecera con el esquema
+# (secciones y, para cada una, sus campos con el dtype de numpy) y después un
+# fotograma por paso: el paso (int32), el número de agentes de cada sección
+# (uint32) y, sección a sección, cada campo como un array contiguo. Todo en little
+# endian. Las posiciones van en x e y; -1 marca un id que falta (estante vacío,
+# caja sin robot). decode() devuelve lo mismo que collect_detailed_data().
+MIMETYPE = "application/vnd.warehouse.frames"
+MAGIC = b"WHF1"
+VERSION = 1
+
+SCHEMA = [
+    ("Robots", [("unique_id", "<i4"), ("x", "<i2"), ("y", "<i2"), ("battery", "<f4"), ("has_box", "|u1")]),
+    ("ConveyorBelts", [("unique_id", "<i4"), ("x", "<i2"), ("y", "<i2"), ("has_box", "|u1")]),
+    ("Shelves", [("unique_id", "<i4"), ("x", "<i2"), ("y", "<i2"), ("stored_box", "<i4")]),
+    ("Boxes", [("unique_id", "<i4"), ("x", "<i2"), ("y", "<i2"), ("weight", "|u1"), ("carried_by_robot", "<i4")]),
+    ("Chargers", [("unique_id", "<i4"), ("x", "<i2"), ("y", "<i2"), ("is_occupied", "|u1")])
+]
+
+FRAME_HEADER = struct.Struct("<i" + "I" * len(SCHEMA))
+
+
+class WireError(ValueError):
+    pass
+
+
+def _header():
+    schema = {"version": VERSION, "sections": [{"name": name, "fields": [list(field) for field in fields]}
+                                               for name, fields in SCHEMA]}
+    data = json.dumps(schema, separators=(",", ":")).encode()
+    return MAGIC + struct.pack("<I", len(data)) + data
+
+
+HEADER = _header()
+# Código de struct de cada campo (el mismo carácter que el dtype de numpy)
+CODES = [[np.dtype(dtype).char for _, dtype in fields] for _, fields in SCHEMA]
+
+
+def _id(agent):
+    return agent.unique_id if agent is not None else -1
+
+
+def rows(model):
+    # Filas de cada sección en el orden de SCHEMA, leídas directamente de los agentes (sin los dicts de
+    # collect_detailed_data) y con los mismos agentes y en el mismo orden que ella. En Boxes solo aparecen las cajas
+    # que llevan los robots, igual que en get_box_data.
+    return [
+        [(robot.unique_id, *robot.pos, robot.battery, robot.box is not None) for robot in model.robots],
+        [(belt.unique_id, *belt.pos, belt.box is not None) for belt in model.schedule_cinta.agents],
+        [(shelf.unique_id, *shelf.pos, _id(shelf.stored_box)) for shelf in model.shelf_agents],
+        [(robot.box.unique_id, *robot.pos, robot.box.peso, robot.unique_id) for robot in model.robots
+         if robot.box is not None],
+        [(charger.unique_id, *charger.pos, charger.is_occupied) for charger in model.charger_agents]
+    ]
+
+
+def pack_frame(model):
+    sections = rows(model)
+    data = [FRAME_HEADER.pack(model.steps, *[len(section) for section in sections])]
+    for section, codes in zip(sections, CODES):
+        columns = zip(*section) if section else [()] * len(codes)
+        data.extend(struct.pack(f"<{len(section)}{code}", *column) for column, code in zip(columns, codes))
+    return b"".join(data)
+
+
+def encode(frames):
+    # Respuesta completa: la cabecera y los fotogramas de pack_frame()
+    return HEADER + b"".join(frames)
+
+
+def decode_arrays(data):
+    # [(paso, {sección: {campo: array}})] de una respuesta binaria
+    data = memoryview(data)
+    if bytes(data[:4]) != MAGIC:
+        raise WireError("Not a warehouse frames response")
+    length, = struct.unpack_from("<I", data, 4)
+    schema = json.loads(bytes(data[8:8 + length]))
+    if schema.get("version") != VERSION:
+        raise WireError(f"Wire format version {schema.get('version')} is not supported (expected {VERSION})")
+
+    sections = [(section["name"], [(name, np.dtype(dtype)) for name, dtype in section["fields"]])
+                for section in schema["sections"]]
+    frame_header = struct.Struct("<i" + "I" * len(sections))
+    offset = 8 + length
+    frames = []
+    while offset < len(data):
+        step, *counts = frame_header.unpack_from(data, offset)
+        offset += frame_header.size
+        frame = {}
+        for (name, fields), count in zip(sections, counts):
+            frame[name] = {}
+            for field, dtype in fields:
+                frame[name][field] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+                offset += count * dtype.itemsize
+        frames.append((step, frame))
+    return frames
+
+
+def _optional(value):
+    return None if value < 0 else value
+
+
+# Campos que decode() convierte de vuelta al formato JSON (posición como tupla, bools, None en lugar de -1)
+CONVERSIONS = {"has_box": bool, "is_occupied": bool, "stored_box": _optional, "carried_by_robot": _optional}
+
+
+def decode(data):
+    # Decodificador de referencia: [(paso, estado)] con el estado igual que collect_detailed_data()
+    frames = []
+    for step, arrays in decode_arrays(data):
+        state = {}
+        for name, columns in arrays.items():
+            fields = [field for field in columns if field not in ("unique_id", "x", "y")]
+            values = [[CONVERSIONS.get(field, lambda value: value)(value) for value in columns[field].tolist()]
+                      for field in fields]
+            positions = zip(columns["x"].tolist(), columns["y"].tolist())
+            state[name] = [{"unique_id": unique_id, "position": position, **dict(zip(fields, row))}
+                           for unique_id, position, *row in zip(columns["unique_id"].tolist(), positions, *values)]
+        frames.append((step, state))
+    return frames
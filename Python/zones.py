@@ -0,0 +1,136 @@
+import multiprocessing
+import weakref
+from bisect import bisect_right
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def zone_starts(layout, zones):
+    # Primera columna de cada zona: franjas verticales de ancho parecido, cortadas en la columna sin estantes (un
+    # pasillo) más cercana al corte ideal para no partir un bloque de estantes
+    shelf_columns = {x for row in layout.shelves for x, _ in row}
+    aisles = [x for x in range(1, layout.width) if x not in shelf_columns] or list(range(1, layout.width))
+    starts = [0]
+    for zone in range(1, zones):
+        ideal = zone * layout.width / zones
+        cut = min(aisles, key=lambda x: (abs(x - ideal), x))
+        if cut > starts[-1]:
+            starts.append(cut)
+    return starts
+
+
+def work(connection, pathfinder, name):
+    # Proceso de una zona: recibe listas de búsquedas y devuelve [(ruta, nodos expandidos)] con la capa de robots
+    # que el almacén mantiene en memoria compartida
+    memory = shared_memory.SharedMemory(name=name)
+    layer = np.ndarray((pathfinder.width, pathfinder.height), dtype=np.int32, buffer=memory.buf)
+    height = pathfinder.height
+    try:
+        for queries in iter(connection.recv, None):
+            robots = layer.ravel().tolist()
+            results = []
+            for start, end, carrying, ignore in queries:
+                expanded = pathfinder.expanded
+                route = pathfinder.search(start, end, pathfinder._carry_goal if carrying else pathfinder._goal, robots,
+                                          ignore[0] * height + ignore[1] if ignore is not None else -1)
+                results.append((route, pathfinder.expanded - expanded))
+            connection.send(results)
+    finally:
+        del layer
+        memory.close()
+
+
+def stop(connections, processes, memory):
+    for connection in connections:
+        try:
+            connection.send(None)
+        except OSError:
+            pass
+        connection.close()
+    for process in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+    try:
+        memory.close()
+    except BufferError:
+        # Aún hay un array sobre la memoria (el almacén se está liberando): se cierra con él
+        pass
+    memory.unlink()
+
+
+# Ejecución por zonas (zones=N en Warehouse). El grid se parte en franjas
+# verticales por los pasillos (zone_starts) y cada zona tiene su proceso con una
+# copia del mapa estático del PathFinder; la capa de robots vive en memoria
+# compartida, así que los movimientos de advance() la actualizan para todos sin
+# mensajes. Al empezar cada paso, antes de la fase de step, plan() pregunta a cada
+# robot despierto qué ruta buscará (Robot.route_query) y manda la búsqueda al
+# proceso de la zona en la que está el robot: un robot que cruza una frontera pasa
+# a la otra zona en el siguiente paso. Las zonas buscan a la vez y las rutas
+# quedan en pathfinder.planned, de donde las toma shortest_path() durante la fase
+# de step. Las decisiones y los movimientos siguen en el proceso del almacén, en
+# el orden de SimultaneousActivation: como durante la fase de step nadie se mueve,
+# cada búsqueda adelantada da la misma ruta que la que haría el robot, y una que
+# no se adelantó (o no acertó) se hace en el momento. El resultado es el mismo
+# que sin zonas; lo que se reparte entre procesos son las búsquedas A*.
+class ZoneWorkers:
+    def __init__(self, model, zones=4):
+        self.model = model
+        pathfinder = model.pathfinder
+        self.starts = zone_starts(model.layout, zones)
+
+        # Capa de robots en memoria compartida (el PathFinder del almacén pasa a escribir en ella)
+        self.memory = shared_memory.SharedMemory(create=True, size=pathfinder.robots.nbytes)
+        layer = np.ndarray(pathfinder.robots.shape, dtype=pathfinder.robots.dtype, buffer=self.memory.buf)
+        layer[:] = pathfinder.robots
+        pathfinder.robots = layer
+
+        context = multiprocessing.get_context()
+        template = pathfinder.copy()
+        self.connections = []
+        self.processes = []
+        for _ in self.starts:
+            connection, child = context.Pipe()
+            process = context.Process(target=work, args=(child, template, self.memory.name), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self._stop = weakref.finalize(self, stop, self.connections, self.processes, self.memory)
+        # Búsquedas adelantadas en las zonas
+        self.queries = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def zone(self, pos):
+        return bisect_right(self.starts, pos[0]) - 1
+
+    def plan(self):
+        model = self.model
+        awake = model.schedule.awake
+        batches = [{} for _ in self.starts]
+        for robot in model.robots:
+            if robot in awake:
+                query = robot.route_query()
+                if query is not None:
+                    batches[self.zone(robot.pos)][query] = None
+
+        sent = []
+        for connection, batch in zip(self.connections, batches):
+            if batch:
+                batch = list(batch)
+                connection.send(batch)
+                sent.append((connection, batch))
+        planned = {}
+        for connection, batch in sent:
+            planned.update(zip(batch, connection.recv()))
+            self.queries += len(batch)
+        model.pathfinder.planned = planned
+
+    def close(self):
+        # La capa de robots vuelve a ser un array normal del PathFinder
+        pathfinder = self.model.pathfinder
+        pathfinder.robots = np.array(pathfinder.robots)
+        self._stop()